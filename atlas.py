@@ -0,0 +1,105 @@
+from argparse import ArgumentParser
+import json
+from os import environ, makedirs, walk
+from os.path import dirname, join
+from typing import List, Optional, Tuple
+
+# no window needed, must be set before pygame starts
+environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from support import ATLAS_MANIFEST, ATLAS_VERSION, atlas_key, file_stamp, resource_path
+
+SOURCE_DIR = 'assets/graphics'
+
+
+def shelf_pack(sizes: List[Tuple[int, int]], page_size: int) -> List[Optional[Tuple[int, int, int]]]:
+    '''
+    Places rects of the given sizes on square pages, row by row (shelves),
+    tallest first so rows waste little height.
+    Returns (page, x, y) for every size, None for sizes bigger than a page.
+    '''
+    order = sorted(range(len(sizes)),
+                   key=lambda index: (-sizes[index][1], -sizes[index][0]))
+    places: List[Optional[Tuple[int, int, int]]] = [None] * len(sizes)
+    page = x = y = shelf_height = 0
+    for index in order:
+        width, height = sizes[index]
+        if width > page_size or height > page_size:
+            continue
+        if x + width > page_size:
+            # next shelf
+            x = 0
+            y += shelf_height
+            shelf_height = 0
+        if y + height > page_size:
+            page += 1
+            x = y = shelf_height = 0
+        places[index] = (page, x, y)
+        x += width
+        shelf_height = max(shelf_height, height)
+    return places
+
+
+def build_atlas(source_dir: str = SOURCE_DIR, page_size: int = 2048) -> dict:
+    # images keep their transparent borders, sprites are placed by image size
+    paths = []
+    for folder, _, files in walk(resource_path(source_dir)):
+        paths.extend(join(folder, file)
+                     for file in sorted(files) if file.endswith('.png'))
+    images = [pygame.image.load(path).convert_alpha() for path in paths]
+    places = shelf_pack([image.get_size() for image in images], page_size)
+
+    # pages are cut down to the height actually used
+    page_heights = {}
+    for image, place in zip(images, places):
+        if place is not None:
+            page, _, y = place
+            page_heights[page] = max(
+                page_heights.get(page, 0), y + image.get_height())
+    pages = [pygame.Surface((page_size, page_heights[page]), flags=pygame.SRCALPHA)
+             for page in range(len(page_heights))]
+
+    manifest = {'version': ATLAS_VERSION, 'pages': [], 'images': {}}
+    for path, image, place in zip(paths, images, places):
+        if place is None:
+            print(f'{path}: bigger than a page, left out')
+            continue
+        page, x, y = place
+        # pages start transparent, so taking the maximum copies pixels exactly
+        pages[page].blit(image, (x, y), special_flags=pygame.BLEND_RGBA_MAX)
+        manifest['images'][atlas_key(path)] = {
+            'page': page,
+            'rect': [x, y, image.get_width(), image.get_height()],
+            'stamp': file_stamp(path),
+        }
+
+    folder = dirname(ATLAS_MANIFEST)
+    makedirs(resource_path(folder), exist_ok=True)
+    for page, surface in enumerate(pages):
+        page_path = f'{folder}/atlas_{page}.png'
+        pygame.image.save(surface, resource_path(page_path))
+        manifest['pages'].append(page_path)
+    with open(resource_path(ATLAS_MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+
+def main():
+    parser = ArgumentParser(
+        description=f'Pack the images in {SOURCE_DIR} into atlas pages.')
+    parser.add_argument('--page-size', type=int, default=2048,
+                        help='width and height of a page in pixels (default: 2048)')
+    args = parser.parse_args()
+
+    pygame.init()
+    # converting images needs a display mode, even on the dummy driver
+    pygame.display.set_mode((1, 1))
+    manifest = build_atlas(page_size=args.page_size)
+    print(f"{len(manifest['images'])} images packed into {len(manifest['pages'])} pages, "
+          f'manifest written to {ATLAS_MANIFEST}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import platform
+from random import randrange
+from time import perf_counter, time
+import traceback
+from typing import Dict, List
+
+# sets up SDL's dummy drivers before pygame starts, in the runner and in every worker
+from headless import init_headless, replay_source, run_level
+import pygame
+import inputs
+from game_data import levels
+from level import Level
+from tools import git_commit, parse_numbers
+
+
+def init_worker(level_numbers: List[int]):
+    # runs once in every worker process: pygame, then one build of each level
+    # so the images are in the asset cache before the first episode
+    init_headless()
+    surface = pygame.display.get_surface()
+    for level_number in level_numbers:
+        try:
+            Level(level_number, surface, lambda *args: None,
+                  lambda *args: None, lambda *args: None, seed=0)
+        except Exception:
+            # the runs of a broken level report the error themselves
+            pass
+
+
+def run_episode(episode: dict) -> dict:
+    # one playthrough in a worker, errors are reported instead of stopping the batch
+    try:
+        if 'replay' in episode:
+            source, segment = replay_source(
+                episode['replay'], episode['level'], episode['segment'])
+            result = run_level(episode['level'], episode['frames'], source,
+                               segment.seed, segment.health, segment.ticks)
+        else:
+            source = inputs.ScriptedInput(episode['script'])
+            result = run_level(
+                episode['level'], episode['frames'], source, episode['seed'])
+    except Exception:
+        result = {'level': episode['level'], 'seed': episode.get('seed'),
+                  'outcome': 'error', 'error': traceback.format_exc()}
+    if 'replay' in episode:
+        result['replay'] = episode['replay']
+        result['segment'] = episode['segment']
+    result['worker'] = os.getpid()
+    return result
+
+
+def make_episodes(level_numbers: List[int], runs: int, script: list, replays: List[str],
+                  frames: int, seed: int = None) -> List[dict]:
+    # seeds are chosen here, not in the workers, so the report can be replayed
+    episodes = []
+    for level_number in level_numbers:
+        # every time a recording starts the level is one run
+        for path in replays:
+            segments = inputs.ReplayInput(path).level_segments(level_number)
+            for index in range(len(segments)):
+                episodes.append({'level': level_number, 'replay': path,
+                                 'segment': index, 'frames': frames})
+        if replays:
+            continue
+        for run in range(runs):
+            episodes.append({
+                'level': level_number,
+                'script': script,
+                'seed': seed + run if seed is not None else randrange(2 ** 32),
+                'frames': frames,
+            })
+    return episodes
+
+
+def summarize(results: List[dict]) -> dict:
+    # outcomes, coins, frames and step times of a group of episodes
+    finished = [result for result in results if result['outcome'] != 'error']
+    summary = {
+        'runs': len(results),
+        'outcomes': dict(Counter(result['outcome'] for result in results)),
+    }
+    if not finished:
+        return summary
+    frames = [result['frames'] for result in finished]
+    coins = [result['coins'] for result in finished]
+    total_frames = sum(frames)
+    summary.update({
+        'frames_mean': total_frames / len(finished),
+        'frames_min': min(frames),
+        'frames_max': max(frames),
+        'coins_mean': sum(coins) / len(finished),
+        'coins_min': min(coins),
+        'coins_max': max(coins),
+        # weighted by frames, so long runs count for what they ran
+        'step_ms_mean': sum(result['step_ms_mean'] * result['frames']
+                            for result in finished) / total_frames if total_frames else 0.0,
+        'step_ms_p95_worst': max(result['step_ms_p95'] for result in finished),
+        'step_ms_max': max(result['step_ms_max'] for result in finished),
+    })
+    return summary
+
+
+def run_batch(episodes: List[dict], workers: int) -> Dict[str, object]:
+    level_numbers = sorted({episode['level'] for episode in episodes})
+    workers = max(1, min(workers, len(episodes)))
+    # a few chunks per worker: few round trips, still balanced when runs differ in length
+    chunksize = max(1, len(episodes) // (workers * 4))
+
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(level_numbers,)) as executor:
+        results = list(executor.map(
+            run_episode, episodes, chunksize=chunksize))
+    wall_seconds = perf_counter() - start
+
+    finished = [result for result in results if result['outcome'] != 'error']
+    total_frames = sum(result['frames'] for result in finished)
+    busy_seconds = sum(result['seconds'] for result in finished)
+    return {
+        'workers': workers,
+        'wall_seconds': wall_seconds,
+        'total_frames': total_frames,
+        'sim_fps': total_frames / wall_seconds if wall_seconds > 0 else 0.0,
+        # time spent playing in the workers over wall time, at most the worker count
+        'parallelism': busy_seconds / wall_seconds if wall_seconds > 0 else 0.0,
+        'levels': {str(level_number): summarize([result for result in results
+                                                 if result['level'] == level_number])
+                   for level_number in level_numbers},
+        'episodes': results,
+    }
+
+
+def main():
+    parser = ArgumentParser(
+        description='Play many headless runs of the levels in parallel and report the outcomes.')
+    parser.add_argument('--levels', default='0',
+                        help='level numbers in game_data.levels (default: 0)')
+    parser.add_argument('--frames', type=int, default=3600,
+                        help='maximum simulation frames per run (default: 3600)')
+    parser.add_argument('--keys', default='',
+                        help="input script, e.g. 'right:0-600,space:40-42'")
+    parser.add_argument('--runs', type=int, default=8,
+                        help='scripted runs per level, each with its own seed (default: 8)')
+    parser.add_argument('--seed', type=int,
+                        help='seed of the first run, the next runs count up from it')
+    parser.add_argument('--replay', metavar='PATH', action='append', default=[],
+                        help='play back the levels started in a recording instead of --keys, can be repeated')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--output', default='batch_results.json',
+                        help='JSON file for the report (default: batch_results.json)')
+    args = parser.parse_args()
+    level_numbers = parse_numbers(args.levels)
+    unknown = [number for number in level_numbers if number not in levels]
+    if unknown:
+        parser.error(f'unknown levels: {unknown}')
+
+    try:
+        episodes = make_episodes(level_numbers, args.runs,
+                                 inputs.parse_script(args.keys), args.replay, args.frames, args.seed)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    batch = run_batch(episodes, args.workers)
+
+    for level_number, summary in batch['levels'].items():
+        outcomes = ', '.join(f'{count} {outcome}' for outcome,
+                             count in sorted(summary['outcomes'].items()))
+        line = f"level {level_number}: {summary['runs']} runs ({outcomes})"
+        if 'frames_mean' in summary:
+            line += (f", {summary['frames_mean']:.0f} frames, {summary['coins_mean']:.1f} coins, "
+                     f"step {summary['step_ms_mean']:.2f} ms (worst p95 {summary['step_ms_p95_worst']:.2f})")
+        print(line)
+    print(f"{len(episodes)} runs on {batch['workers']} workers in {batch['wall_seconds']:.1f} s: "
+          f"{batch['sim_fps']:.0f} simulated frames/s, {batch['parallelism']:.1f} workers busy on average")
+    for result in batch['episodes']:
+        if result['outcome'] == 'error':
+            run = f"{result['replay']} run {result['segment']}" if 'replay' in result else f"seed {result['seed']}"
+            print(f"level {result['level']} ({run}) failed:\n{result['error']}")
+
+    report = {
+        'commit': git_commit(),
+        'time': time(),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'frames': args.frames,
+        **batch,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'report written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
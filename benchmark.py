@@ -0,0 +1,219 @@
+from argparse import ArgumentParser
+from csv import writer
+import gc
+import json
+from os.path import join
+import platform
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter, time
+import tracemalloc
+from typing import Dict, List
+
+# sets up SDL's dummy drivers before pygame starts
+from headless import init_headless, percentile
+import pygame
+import game_time
+import inputs
+from game_data import levels
+from level import Level
+from level_loader import LAYERS, compile_level
+from settings import VERTICAL_TILE_NUMBER
+from support import asset_cache
+from tiles import StaticChunk
+from tools import git_commit, parse_numbers
+
+GROUND_ROW = VERTICAL_TILE_NUMBER - 2
+# every enemy needs its own stretch of ground between two constraints
+ENEMY_SPACING = 4
+
+
+def enemy_columns(columns: int) -> List[int]:
+    return list(range(5, columns - 5, ENEMY_SPACING))
+
+
+def coin_cells(columns: int) -> List[tuple]:
+    return [(row, column) for column in range(3, columns - 3)
+            for row in range(2, GROUND_ROW - 1)]
+
+
+def generate_level(directory: str, name: str, columns: int, enemies: int, coins: int, seed: int = 0) -> dict:
+    '''
+    Writes one CSV file per layer, like the Tiled export, and returns
+    a level entry in the format of game_data.levels.
+    The ground runs along the whole level with a gap every 25 columns,
+    enemies patrol between constraints and coins float above the ground.
+    '''
+    rng = Random(seed)
+    grids = {layer: [[-1] * columns for _ in range(VERTICAL_TILE_NUMBER)]
+             for layer in LAYERS}
+
+    for column in range(columns):
+        if column % 25 == 24 and 2 < column < columns - 3:
+            continue
+        grids['terrain'][GROUND_ROW][column] = 1
+        grids['terrain'][GROUND_ROW + 1][column] = 5
+        if rng.random() < 0.3:
+            grids['grass'][GROUND_ROW - 1][column] = rng.randrange(5)
+        if rng.random() < 0.05:
+            grids['bg_palms'][GROUND_ROW - 1][column] = 0
+
+    for column in enemy_columns(columns)[:enemies]:
+        grids['enemies'][GROUND_ROW - 1][column] = 0
+        grids['constraints'][GROUND_ROW - 1][column - 1] = 0
+        grids['constraints'][GROUND_ROW - 1][column + 2] = 0
+        # no gap under a patrol
+        for patrol_column in range(column - 1, column + 3):
+            grids['terrain'][GROUND_ROW][patrol_column] = 1
+
+    cells = coin_cells(columns)
+    for row, column in rng.sample(cells, min(coins, len(cells))):
+        grids['coins'][row][column] = rng.randrange(2)
+
+    for column in range(10, columns - 10, 40):
+        grids['crates'][GROUND_ROW - 1][column] = 0
+        grids['fg_palms'][GROUND_ROW - 1][column + 7] = rng.randrange(2)
+
+    grids['player'][GROUND_ROW - 1][1] = 0
+    grids['player'][GROUND_ROW - 1][columns - 2] = 1
+
+    level_data = {
+        'node_pos': (0, 0),
+        'unlock': 0,
+        'content': name,
+        'compiled': join(directory, f'{name}.lvl'),
+    }
+    for layer, grid in grids.items():
+        path = join(directory, f'{name}_{layer}.csv')
+        with open(path, 'w', newline='') as file:
+            writer(file).writerows(grid)
+        level_data[layer] = path
+    return level_data
+
+
+def surface_stats(level: Level) -> Dict[str, int]:
+    # surfaces held by the asset cache, the sprites and the pre-rendered chunks
+    surfaces = {}
+    for value in asset_cache.entries.values():
+        for surface in value if isinstance(value, list) else [value]:
+            surfaces[id(surface)] = surface
+    for sprite in level.visible_sprites:
+        if not isinstance(sprite, StaticChunk):
+            surfaces[id(sprite.image)] = sprite.image
+    for chunk in level.static_layer.chunks.values():
+        if chunk.surface is not None:
+            surfaces[id(chunk.surface)] = chunk.surface
+
+    pixel_bytes = sum(surface.get_width() * surface.get_height() * surface.get_bytesize()
+                      for surface in surfaces.values())
+    return {'surfaces': len(surfaces), 'surface_bytes': pixel_bytes}
+
+
+def benchmark_level(key: str, frames: int) -> dict:
+    surface = pygame.display.get_surface()
+
+    def new_level():
+        return Level(key, surface, lambda *args: None,
+                     lambda *args: None, lambda *args: None, seed=0)
+
+    # walk right and jump now and then, so the camera scrolls through the level
+    inputs.set_source(inputs.ScriptedInput(
+        [(pygame.K_RIGHT, 0, frames)] + [(pygame.K_SPACE, frame, frame + 2) for frame in range(30, frames, 60)]))
+    game_time.use_simulated_time()
+
+    gc.collect()
+    start = perf_counter()
+    level = new_level()
+    init_seconds = perf_counter() - start
+
+    update_times = []
+    draw_times = []
+    for _ in range(frames):
+        start = perf_counter()
+        level.update()
+        middle = perf_counter()
+        level.draw()
+        end = perf_counter()
+        inputs.next_frame()
+        game_time.advance(1000 / 60)
+        update_times.append((middle - start) * 1000)
+        draw_times.append((end - middle) * 1000)
+    stats = surface_stats(level)
+    sleeping = level.sleeping_counts()
+
+    # second build with tracemalloc on, so its overhead stays out of the timings
+    # SDL pixel memory is not seen here, see surface_bytes for that
+    del level
+    gc.collect()
+    tracemalloc.start()
+    level = new_level()
+    level.update()
+    level.draw()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'init_ms': init_seconds * 1000,
+        'update_ms_mean': sum(update_times) / frames,
+        'update_ms_p95': percentile(update_times, 0.95),
+        'draw_ms_mean': sum(draw_times) / frames,
+        'draw_ms_p95': percentile(draw_times, 0.95),
+        'python_peak_bytes': peak,
+        'sprites': len(level.visible_sprites),
+        'sleeping_enemies': sleeping['enemies'],
+        **stats,
+    }
+
+
+def main():
+    parser = ArgumentParser(
+        description='Benchmark level loading and frame times on generated levels.')
+    parser.add_argument('--columns', default='100,1000,5000',
+                        help='level widths in tiles (default: 100,1000,5000)')
+    parser.add_argument('--entities', default='10,100,1000',
+                        help='enemies and coins per level (default: 10,100,1000)')
+    parser.add_argument('--frames', type=int, default=300,
+                        help='frames to run per level (default: 300)')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON file for the results (default: benchmark_results.json)')
+    args = parser.parse_args()
+
+    init_headless()
+    results = []
+    with TemporaryDirectory() as directory:
+        for columns in parse_numbers(args.columns):
+            for entities in parse_numbers(args.entities):
+                key = f'bench_{columns}_{entities}'
+                levels[key] = generate_level(
+                    directory, key, columns, entities, entities)
+                # the game compiles a level on its first load, time the loads after that
+                compile_level(levels[key])
+                try:
+                    result = benchmark_level(key, args.frames)
+                finally:
+                    del levels[key]
+                # small levels cannot hold every entity asked for
+                result = {'columns': columns,
+                          'enemies': min(entities, len(enemy_columns(columns))),
+                          'coins': min(entities, len(coin_cells(columns))),
+                          **result}
+                results.append(result)
+                print(f"{columns:>6} columns {entities:>6} entities: init {result['init_ms']:8.1f} ms, "
+                      f"update {result['update_ms_mean']:6.2f} ms, draw {result['draw_ms_mean']:6.2f} ms, "
+                      f"{result['surfaces']} surfaces")
+
+    report = {
+        'commit': git_commit(),
+        'time': time(),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'frames': args.frames,
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,31 @@
 from typing import List
 import pygame
-from support import import_folder, resource_path
-from settings import VERTICAL_TILE_NUMBER, TILE_SIZE, SCREEN_WIDTH
-from tiles import AnimatedTile, StaticTile
-from random import choice, randint
+from support import import_folder, import_image
+from settings import VERTICAL_TILE_NUMBER, TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT
+from tiles import AnimatedTile, AnimationClock, StaticTile
+from random import Random, choice, randint
 
 
 class Sky:
+    '''
+    Nothing in the sky changes, so it is composed once into a screen sized
+    surface and drawn with a single blit.
+    '''
+
     def __init__(self, horizon, style='level') -> None:
-        self.top = pygame.image.load(resource_path(
-            'assets/graphics/decoration/sky/sky_top.png')).convert()
-        self.bottom = pygame.image.load(resource_path(
-            'assets/graphics/decoration/sky/sky_bottom.png')).convert()
-        self.middle = pygame.image.load(resource_path(
-            'assets/graphics/decoration/sky/sky_middle.png')).convert()
+        self.top = import_image(
+            'assets/graphics/decoration/sky/sky_top.png', alpha=False)
+        self.bottom = import_image(
+            'assets/graphics/decoration/sky/sky_bottom.png', alpha=False)
+        self.middle = import_image(
+            'assets/graphics/decoration/sky/sky_middle.png', alpha=False)
         self.horizon = horizon
 
         self.style = style
+        self.palms = []
+        self.clouds = []
         if self.style == 'overworld':
             palm_surfaces = import_folder('assets/graphics/overworld/palms')
-            self.palms = []
             for surface in [choice(palm_surfaces) for _ in range(10)]:
                 x = randint(0, SCREEN_WIDTH)
                 y = self.horizon*TILE_SIZE + randint(50, 100)
@@ -27,7 +33,6 @@ class Sky:
                 self.palms.append((surface, rect))
 
             cloud_surfaces = import_folder('assets/graphics/overworld/clouds')
-            self.clouds = []
             for surface in [choice(cloud_surfaces) for _ in range(10)]:
                 x = randint(0, SCREEN_WIDTH)
                 y = randint(0, self.horizon*TILE_SIZE - 100)
@@ -41,40 +46,57 @@ class Sky:
         self.middle = pygame.transform.scale(
             self.middle, (SCREEN_WIDTH, TILE_SIZE))
 
-    def draw(self, surface: pygame.Surface):
+        # strips, palms and clouds baked together
+        self.background = pygame.Surface(
+            (SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
         for row in range(VERTICAL_TILE_NUMBER):
             y = row * TILE_SIZE
             if row < self.horizon:
-                surface.blit(self.top, (0, y))
+                self.background.blit(self.top, (0, y))
             elif row == self.horizon:
-                surface.blit(self.middle, (0, y))
+                self.background.blit(self.middle, (0, y))
             else:
-                surface.blit(self.bottom, (0, y))
+                self.background.blit(self.bottom, (0, y))
+        self.background.blits(self.palms + self.clouds, doreturn=False)
 
-        if self.style == 'overworld':
-            for palm_surf, palm_rect in self.palms:
-                surface.blit(palm_surf, palm_rect)
-            for cloud_surf, cloud_rect in self.clouds:
-                surface.blit(cloud_surf, cloud_rect)
+    def draw(self, surface: pygame.Surface):
+        surface.blit(self.background, (0, 0))
 
 
 class Water:
     # the water needs to stretch more than the level width
     # both to the left and to the right
-    def __init__(self, top, level_width, groups: List[pygame.sprite.Group]) -> None:
-        water_start = -SCREEN_WIDTH
-        water_tile_width = 192
-        tile_x_amount = (level_width + SCREEN_WIDTH) // water_tile_width
+    def __init__(self, top, level_width, groups: List[pygame.sprite.Group], spawn: bool = True, clock: AnimationClock = None) -> None:
+        self.top = top
+        self.groups = groups
+        # every water tile shows the same frame
+        self.clock = clock
+        self.tile_width = 192
+        self.start = -SCREEN_WIDTH
+        self.tile_x_amount = (level_width + SCREEN_WIDTH) // self.tile_width
+        # streamed levels spawn the water in parts with spawn_between()
+        if spawn:
+            self.spawn_between(self.start, level_width + SCREEN_WIDTH)
 
-        for tile in range(tile_x_amount):
-            x = tile * water_tile_width + water_start
-            y = top
-            sprite = AnimatedTile((x, y), water_tile_width,
-                                  'assets/graphics/decoration/water', groups)
+    def spawn_between(self, left, right) -> List[AnimatedTile]:
+        # tiles starting in [left, right)
+        first = max(-(-(left - self.start) // self.tile_width), 0)
+        last = min(-(-(right - self.start) // self.tile_width),
+                   self.tile_x_amount)
+        sprites = []
+        for tile in range(first, last):
+            x = tile * self.tile_width + self.start
+            y = self.top
+            sprites.append(AnimatedTile((x, y), self.tile_width,
+                                        'assets/graphics/decoration/water', self.groups, self.clock))
+        return sprites
 
 
 class Clouds:
-    def __init__(self, horizon, level_width, cloud_number, groups: List[pygame.sprite.Group]) -> None:
+    def __init__(self, horizon, level_width, cloud_number, groups: List[pygame.sprite.Group], rng: Random = None) -> None:
+        # a seeded rng places the clouds the same way every time
+        if rng is None:
+            rng = Random()
         cloud_surface_list = import_folder('assets/graphics/decoration/clouds')
         min_x = -SCREEN_WIDTH
         max_x = level_width + SCREEN_WIDTH
@@ -82,9 +104,9 @@ class Clouds:
         max_y = horizon
 
         for _ in range(cloud_number):
-            cloud_surface = choice(cloud_surface_list)
-            x = randint(min_x, max_x)
-            y = randint(min_y, max_y)
+            cloud_surface = rng.choice(cloud_surface_list)
+            x = rng.randint(min_x, max_x)
+            y = rng.randint(min_y, max_y)
             StaticTile((x, y), 0, cloud_surface, groups)
 
 
@@ -1,39 +1,232 @@
-from typing import List
+from array import array
+from typing import Dict, List, Tuple
 import pygame
 from tiles import AnimatedTile
-from random import randint
+from settings import ACTIVITY_MARGIN, TILE_SIZE
+from spatial import CollisionMap, moved
+from support import import_mirrored_folder
+from random import Random
 
 
 class Enemy(AnimatedTile):
-    def __init__(self, pos, size, groups: List[pygame.sprite.Group], constrains: pygame.sprite.Group) -> None:
+    def __init__(self, pos, size, groups: List[pygame.sprite.Group], rng: Random = None) -> None:
         super().__init__(pos, size, 'assets/graphics/enemy/run', groups)
+        # frames are drawn facing left, these face right
+        self.flipped_frames = import_mirrored_folder('assets/graphics/enemy/run')
         self.rect.y += size - self.image.get_height()
-        self.speed = randint(3, 6)
-        self.constrains = constrains
-
-    def move(self):
-        self.rect.x += self.speed
-
-    def reverse_image(self):
-        if self.speed > 0:
-            self.image = pygame.transform.flip(
-                self.image, flip_x=True, flip_y=False)
-
-    def constraint_collision(self):
-        for sprite in self.constrains.sprites():
-            if sprite.rect.colliderect(self.rect):
-                self.reverse()
-                # break avoids colliding twice when one constrain is right above the other
+        if rng is None:
+            rng = Random()
+        self.speed = rng.randint(3, 6)
+        # set when an EnemySystem takes over this enemy
+        self.system: 'EnemySystem' = None
+        self.index = 0
+
+    def kill(self):
+        super().kill()
+        if self.system is not None:
+            self.system.remove(self.index)
+
+
+class EnemySystem:
+    '''
+    Runs every enemy of a level in one pass over flat arrays
+    instead of calling run() on each Enemy.
+    Patrol limits come from the constraints when an enemy is added, so a step is a few
+    integer compares per enemy. Enemy sprites are only brought up to date
+    (rect, image, spatial index, camera buckets) when they are near the view,
+    which is where they are drawn and where the player can touch them.
+    Enemies further than activity_margin from the view sleep where they are
+    and are skipped until the view comes back, so the cost of a step depends
+    on the enemies near the view. None keeps every enemy awake.
+    '''
+
+    def __init__(self, constraint_map: CollisionMap, sync_margin: int = TILE_SIZE * 3,
+                 activity_margin: int = ACTIVITY_MARGIN, bucket_width: int = TILE_SIZE * 4) -> None:
+        # constraint cells of the whole level, enemies turn around before them
+        self.constraint_map = constraint_map
+        self.sync_margin = sync_margin
+        self.activity_margin = activity_margin
+        self.sprites: List[Enemy] = []
+        self.x = array('i')
+        self.speed = array('i')
+        self.frame_index = array('d')
+        # reverse when the rect overlaps the constraint before left or after right
+        self.left_limit = array('i')
+        self.right_limit = array('i')
+        self.alive = bytearray()
+        # awake enemies in the order they woke up
+        self.awake: Dict[int, None] = {}
+        # sleeping enemies bucketed by the column of their x,
+        # waking up only looks at the buckets around the view
+        self.sleeping: Dict[int, Dict[int, None]] = {}
+        self.sleeping_count = 0
+        self.bucket_width = bucket_width
+        # slots of removed enemies, reused by add()
+        self.free: List[int] = []
+
+        self.frames = []
+        self.flipped_frames = []
+        self.width = 0
+        self.animation_speed = 0.15
+
+    def add(self, enemy: Enemy):
+        if not self.sprites:
+            self.frames = enemy.frames
+            self.flipped_frames = enemy.flipped_frames
+            self.width = enemy.rect.width
+        left, right = self.patrol_limits(enemy.rect)
+        if self.free:
+            index = self.free.pop()
+            self.sprites[index] = enemy
+            self.x[index] = enemy.rect.x
+            self.speed[index] = enemy.speed
+            self.frame_index[index] = 0.0
+            self.left_limit[index] = left
+            self.right_limit[index] = right
+            self.alive[index] = 1
+        else:
+            index = len(self.sprites)
+            self.sprites.append(enemy)
+            self.x.append(enemy.rect.x)
+            self.speed.append(enemy.speed)
+            self.frame_index.append(0.0)
+            self.left_limit.append(left)
+            self.right_limit.append(right)
+            self.alive.append(1)
+        # new enemies wake up in the next update if they are in range
+        self.sleep(index)
+        enemy.system = self
+        enemy.index = index
+
+    def patrol_limits(self, rect: pygame.Rect) -> Tuple[int, int]:
+        # nearest constraints on both sides that share a row with the enemy,
+        # found by walking the grid outwards from the enemy
+        # enemies move less than a tile per step, so they never skip one
+        grid = self.constraint_map
+        size = grid.cell_size
+        first_column = rect.left // size
+        last_column = (rect.right - 1) // size
+        rows = range(rect.top // size, (rect.bottom - 1) // size + 1)
+
+        left = -2 ** 31
+        for column in range(first_column, -1, -1):
+            if (column + 1) * size <= rect.left and any(grid.is_solid(column, row) for row in rows):
+                left = (column + 1) * size
+                break
+        right = 2 ** 31 - 1
+        for column in range(last_column, grid.columns):
+            if column * size >= rect.right and any(grid.is_solid(column, row) for row in rows):
+                right = column * size
                 break
+        return left, right
+
+    def remove(self, index: int):
+        if self.alive[index]:
+            self.alive[index] = 0
+            if index in self.awake:
+                del self.awake[index]
+            else:
+                self.unbucket(index)
+            self.sprites[index].system = None
+            self.free.append(index)
+
+    def place(self, index: int, x: int, speed: int, frame_index: float):
+        # puts an enemy back in the state it had, used when streaming brings it back
+        awake = index in self.awake
+        if not awake:
+            self.unbucket(index)
+        self.x[index] = x
+        self.speed[index] = speed
+        self.frame_index[index] = frame_index
+        if not awake:
+            self.sleep(index)
+        self.sync(index)
+
+    def unbucket(self, index: int):
+        # takes a sleeping enemy out of its bucket
+        column = self.x[index] // self.bucket_width
+        del self.sleeping[column][index]
+        if not self.sleeping[column]:
+            del self.sleeping[column]
+        self.sleeping_count -= 1
+
+    def sleep(self, index: int):
+        column = self.x[index] // self.bucket_width
+        self.sleeping.setdefault(column, {})[index] = None
+        self.sleeping_count += 1
+
+    def wake(self, left: int, right: int):
+        # wakes the sleeping enemies with x between left and right, column by column
+        first = left // self.bucket_width
+        last = right // self.bucket_width
+        columns = range(first, last + 1)
+        if len(columns) > len(self.sleeping):
+            columns = sorted(
+                column for column in self.sleeping if first <= column <= last)
+        x = self.x
+        for column in columns:
+            bucket = self.sleeping.get(column)
+            if not bucket:
+                continue
+            for index in list(bucket):
+                if left < x[index] < right:
+                    del bucket[index]
+                    self.awake[index] = None
+                    self.sleeping_count -= 1
+            if not bucket:
+                del self.sleeping[column]
+
+    def update(self, view_rect: pygame.Rect):
+        x = self.x
+        speed = self.speed
+        frame_index = self.frame_index
+        left_limit = self.left_limit
+        right_limit = self.right_limit
+        width = self.width
+        frame_count = len(self.frames)
+        animation_speed = self.animation_speed
+        sync_left = view_rect.left - self.sync_margin - width
+        sync_right = view_rect.right + self.sync_margin
+        if self.activity_margin is None:
+            active_left = -2 ** 31
+            active_right = 2 ** 31
+        else:
+            active_left = view_rect.left - self.activity_margin - width
+            active_right = view_rect.right + self.activity_margin
+
+        self.wake(active_left, active_right)
+        falling_asleep = []
+        for index in self.awake:
+            frame = frame_index[index] + animation_speed
+            if frame >= frame_count:
+                frame = 0.0
+            frame_index[index] = frame
+
+            position = x[index] + speed[index]
+            x[index] = position
+            if position < left_limit[index] or position + width > right_limit[index]:
+                speed[index] = -speed[index]
+
+            if sync_left < position < sync_right:
+                self.sync(index)
+            if not active_left < position < active_right:
+                falling_asleep.append(index)
 
-    def run(self):
-        self.animate()
-        self.move()
-        self.constraint_collision()
-        self.reverse_image()
+        for index in falling_asleep:
+            del self.awake[index]
+            self.sleep(index)
 
-    def reverse(self):
-        self.speed *= -1
+    def sync(self, index: int):
+        enemy = self.sprites[index]
+        enemy.rect.x = self.x[index]
+        enemy.speed = self.speed[index]
+        enemy.frame_index = self.frame_index[index]
+        if enemy.speed > 0:
+            enemy.image = self.flipped_frames[int(enemy.frame_index)]
+        else:
+            enemy.image = self.frames[int(enemy.frame_index)]
+        # spatial index and camera buckets
+        moved(enemy)
 
 
 if __name__ == '__main__':
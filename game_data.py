@@ -8,6 +8,8 @@ level_0 = {
     'constraints': 'assets/levels/0/level_0_constraints.csv',
     'player': 'assets/levels/0/level_0_player.csv',
     'grass': 'assets/levels/0/level_0_grass.csv',
+    'compiled': 'assets/levels/0/level_0.lvl',
+    'tmx': 'assets/levels/level_data/level_0.tmx',
     'node_pos': (110, 400),
     'unlock': 1,
     'content': 'Level 0',
@@ -23,6 +25,7 @@ level_1 = {
     'constraints': 'assets/levels/1/level_1_constraints.csv',
     'player': 'assets/levels/1/level_1_player.csv',
     'grass': 'assets/levels/1/level_1_grass.csv',
+    'compiled': 'assets/levels/1/level_1.lvl',
     'node_pos': (300, 220),
     'unlock': 2,
     'content': 'Level 1',
@@ -38,6 +41,7 @@ level_2 = {
     'constraints': 'assets/levels/2/level_2_constraints.csv',
     'player': 'assets/levels/2/level_2_player.csv',
     'grass': 'assets/levels/2/level_2_grass.csv',
+    'compiled': 'assets/levels/2/level_2.lvl',
     'node_pos': (480, 610),
     'unlock': 3,
     'content': 'Level 2',
@@ -53,6 +57,8 @@ level_B = {
     'constraints': 'assets/levels/B/level_B_constraints.csv',
     'player': 'assets/levels/B/level_B_player.csv',
     'grass': 'assets/levels/B/level_B_grass.csv',
+    'compiled': 'assets/levels/B/level_B.lvl',
+    'tmx': 'assets/levels/level_data/level_B.tmx',
     'node_pos': (610, 350),
     'unlock': 4,
     'content': 'Level B',
@@ -68,6 +74,7 @@ level_3 = {
     'constraints': 'assets/levels/3/level_3_constraints.csv',
     'player': 'assets/levels/3/level_3_player.csv',
     'grass': 'assets/levels/3/level_3_grass.csv',
+    'compiled': 'assets/levels/3/level_3.lvl',
     'node_pos': (610, 350),
     'unlock': 4,
     'content': 'Level 3',
@@ -83,6 +90,7 @@ level_4 = {
     'constraints': 'assets/levels/4/level_4_constraints.csv',
     'player': 'assets/levels/4/level_4_player.csv',
     'grass': 'assets/levels/4/level_4_grass.csv',
+    'compiled': 'assets/levels/4/level_4.lvl',
     'node_pos': (880, 210),
     'unlock': 5,
     'content': 'Level 4',
@@ -98,6 +106,7 @@ level_5 = {
     'constraints': 'assets/levels/5/level_5_constraints.csv',
     'player': 'assets/levels/5/level_5_player.csv',
     'grass': 'assets/levels/5/level_5_grass.csv',
+    'compiled': 'assets/levels/5/level_5.lvl',
     'node_pos': (1050, 400),
     'unlock': 5,
     'content': 'Level 5',
@@ -0,0 +1,32 @@
+import pygame
+
+# None means real time, otherwise milliseconds of simulated time
+simulated_ticks = None
+
+
+def use_simulated_time(start: float = 0):
+    global simulated_ticks
+    simulated_ticks = start
+
+
+def use_real_time():
+    global simulated_ticks
+    simulated_ticks = None
+
+
+def advance(milliseconds: float):
+    global simulated_ticks
+    if simulated_ticks is not None:
+        simulated_ticks += milliseconds
+
+
+def get_ticks() -> int:
+    # drop-in for pygame.time.get_ticks() that follows the simulation when it runs headless
+    if simulated_ticks is None:
+        return pygame.time.get_ticks()
+    return int(simulated_ticks)
+
+
+if __name__ == '__main__':
+    from main import main
+    main()
@@ -0,0 +1,165 @@
+import os
+from argparse import ArgumentParser
+from random import randrange
+from time import perf_counter
+from typing import List, Tuple
+
+# no window and no sound card needed, must be set before pygame starts
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import game_time
+import inputs
+from level import Level
+from settings import SCREEN_WIDTH, SCREEN_HEIGHT, SIMULATION_HZ
+
+
+def init_headless():
+    pygame.init()
+    # Level converts surfaces, which needs a display mode even on the dummy driver
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Playthrough:
+    '''
+    Plays one level without drawing anything, keeping score like Game does.
+    outcome stays None while the level is running, then becomes
+    'win', 'fell', 'dead' or 'exit' (escape pressed).
+    '''
+
+    def __init__(self, level_number: int, max_health: int = 100, seed: int = None) -> None:
+        self.level_number = level_number
+        self.outcome = None
+        self.frames = 0
+        self.coins = 0
+        self.health = max_health
+        self.level = Level(level_number, pygame.display.get_surface(),
+                           self.finish, self.change_coins, self.change_health, seed=seed)
+
+    def finish(self, current_level: int, new_max_level: int):
+        if self.outcome is not None:
+            return
+        if new_max_level > 0:
+            self.outcome = 'win'
+        elif self.level.player.rect.top > SCREEN_HEIGHT:
+            self.outcome = 'fell'
+        else:
+            self.outcome = 'exit'
+
+    def change_coins(self, amount: int):
+        self.coins += amount
+
+    def change_health(self, amount: int):
+        self.health += amount
+
+    def step(self):
+        self.level.update()
+        inputs.next_frame()
+        game_time.advance(1000 / SIMULATION_HZ)
+        self.frames += 1
+        if self.outcome is None and self.health <= 0:
+            self.outcome = 'dead'
+
+
+def replay_source(path: str, level_number: int, index: int = 0) -> Tuple[inputs.ReplayInput, inputs.LevelSegment]:
+    # playback of the index-th time level_number was started in a recording,
+    # pass the segment's seed, health and ticks to run_level to play it as it was played there
+    source = inputs.ReplayInput(path)
+    segments = source.level_segments(level_number)
+    if index >= len(segments):
+        raise ValueError(
+            f'{path} starts level {level_number} {len(segments)} times, run {index} asked for')
+    source.seek(segments[index])
+    return source, segments[index]
+
+
+def run_level(level_number: int, max_frames: int, source, seed: int = None,
+              health: int = 100, ticks: float = 0.0) -> dict:
+    # runs until the level ends or max_frames simulation steps have passed
+    # health and ticks let a level recorded in the middle of a game start as it did there
+    inputs.set_source(source)
+    game_time.use_simulated_time(ticks)
+
+    playthrough = Playthrough(level_number, max_health=health, seed=seed)
+    inputs.start_level(level_number, playthrough.level.seed, health)
+    # milliseconds taken by each simulation step
+    step_times = []
+    start = perf_counter()
+    while playthrough.outcome is None and playthrough.frames < max_frames:
+        step_start = perf_counter()
+        playthrough.step()
+        step_times.append((perf_counter() - step_start) * 1000)
+    seconds = perf_counter() - start
+
+    return {
+        'level': level_number,
+        'seed': playthrough.level.seed,
+        'outcome': playthrough.outcome or 'timeout',
+        'frames': playthrough.frames,
+        'coins': playthrough.coins,
+        'health': playthrough.health,
+        'seconds': seconds,
+        'sim_fps': playthrough.frames / seconds if seconds > 0 else 0.0,
+        'step_ms_mean': sum(step_times) / len(step_times) if step_times else 0.0,
+        'step_ms_p95': percentile(step_times, 0.95) if step_times else 0.0,
+        'step_ms_max': max(step_times, default=0.0),
+    }
+
+
+def main():
+    parser = ArgumentParser(
+        description='Run a level without a window, as fast as possible.')
+    parser.add_argument('level', type=int, help='level number in game_data.levels')
+    parser.add_argument('--frames', type=int, default=3600,
+                        help='maximum simulation frames (default: 3600)')
+    parser.add_argument('--keys', default='',
+                        help="input script, e.g. 'right:0-600,space:40-42'")
+    parser.add_argument('--runs', type=int, default=1,
+                        help='number of playthroughs (default: 1)')
+    parser.add_argument('--seed', type=int,
+                        help='level seed, random when not given')
+    parser.add_argument('--record', metavar='PATH',
+                        help='save the keys of the (last) run to PATH')
+    parser.add_argument('--replay', metavar='PATH',
+                        help='play back the first time the level starts in a recording, instead of --keys')
+    args = parser.parse_args()
+
+    init_headless()
+    script = inputs.parse_script(args.keys)
+    total_frames = 0
+    total_seconds = 0.0
+    for _ in range(args.runs):
+        health = 100
+        ticks = 0.0
+        if args.replay:
+            try:
+                source, segment = replay_source(args.replay, args.level)
+            except (OSError, ValueError) as error:
+                parser.error(str(error))
+            seed = segment.seed
+            health = segment.health
+            ticks = segment.ticks
+        else:
+            source = inputs.ScriptedInput(script)
+            seed = args.seed if args.seed is not None else randrange(2 ** 32)
+        if args.record:
+            source = inputs.RecordingInput(source, seed)
+        result = run_level(args.level, args.frames, source, seed, health, ticks)
+        if args.record:
+            source.save(args.record)
+        total_frames += result['frames']
+        total_seconds += result['seconds']
+        print(f"level {result['level']} (seed {result['seed']}): {result['outcome']} after {result['frames']} frames, "
+              f"{result['coins']} coins, {result['health']} health, {result['sim_fps']:.0f} frames/s")
+    if args.runs > 1 and total_seconds > 0:
+        print(f'{args.runs} runs: {total_frames / total_seconds:.0f} simulated frames/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+from array import array
+import struct
+from typing import Iterable, List, Optional, Tuple
+import pygame
+import game_time
+
+# names usable in input scripts
+KEY_NAMES = {
+    'left': pygame.K_LEFT,
+    'right': pygame.K_RIGHT,
+    'space': pygame.K_SPACE,
+    'return': pygame.K_RETURN,
+    'escape': pygame.K_ESCAPE,
+}
+# keys stored in recordings, bit n of a frame mask is RECORDED_KEYS[n]
+RECORDED_KEYS = tuple(KEY_NAMES.values())
+
+# magic, version, seed, frame count, level segment count,
+# then the segments and (frames, mask) runs
+RECORDING_HEADER = struct.Struct('<4sHQII')
+# level, level seed, first frame, health, simulated ticks at that frame
+RECORDING_SEGMENT = struct.Struct('<HQIid')
+RECORDING_RUN = struct.Struct('<IB')
+RECORDING_MAGIC = b'PLIN'
+RECORDING_VERSION = 2
+# version 1 recordings have no segments, they were made by headless.py from frame 0
+RECORDING_HEADER_V1 = struct.Struct('<4sHQI')
+
+
+class KeyState:
+    '''
+    Pressed keys of one frame, indexed like the result of pygame.key.get_pressed()
+    '''
+
+    def __init__(self, pressed: Iterable[int] = ()) -> None:
+        self.pressed = frozenset(pressed)
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.pressed
+
+
+class LevelSegment:
+    '''
+    Where one level starts in a recording, with what it needs to be played on its own:
+    the level seed, the health the player had and the simulated time of its first step.
+    level is None for old recordings, which hold one level played from frame 0.
+    '''
+
+    def __init__(self, level: Optional[int], seed: int, first_frame: int, health: int, ticks: float) -> None:
+        self.level = level
+        self.seed = seed
+        self.first_frame = first_frame
+        self.health = health
+        self.ticks = ticks
+
+
+class KeyboardInput:
+    def get_pressed(self):
+        return pygame.key.get_pressed()
+
+    def next_frame(self):
+        pass
+
+
+class ScriptedInput:
+    '''
+    Holds keys during ranges of simulation frames, last frame included.
+    '''
+
+    def __init__(self, script: List[Tuple[int, int, int]]) -> None:
+        # (key, first frame, last frame)
+        self.script = script
+        self.frame = 0
+
+    def get_pressed(self) -> KeyState:
+        return KeyState(key for key, first, last in self.script
+                        if first <= self.frame <= last)
+
+    def next_frame(self):
+        self.frame += 1
+
+
+class RecordingInput:
+    '''
+    Passes the keys of another source through and remembers them frame by frame.
+    The seed is saved with the keys so a replay builds the same levels,
+    and every level started gets a segment so it can also be replayed alone.
+    '''
+
+    def __init__(self, source, seed: int) -> None:
+        self.source = source
+        self.seed = seed
+        self.masks = array('B')
+        self.segments: List[LevelSegment] = []
+        self.current = None
+
+    def get_pressed(self) -> KeyState:
+        # the first poll of a frame is what the whole frame sees
+        if self.current is None:
+            keys = self.source.get_pressed()
+            self.current = KeyState(key for key in RECORDED_KEYS if keys[key])
+        return self.current
+
+    def next_frame(self):
+        self.masks.append(key_mask(self.current) if self.current else 0)
+        self.current = None
+        self.source.next_frame()
+
+    def start_level(self, level_number: int, seed: int, health: int):
+        self.segments.append(LevelSegment(level_number, seed, len(
+            self.masks), health, game_time.simulated_ticks or 0.0))
+
+    def save(self, path: str):
+        write_recording(path, self.seed, self.masks, self.segments)
+
+
+class ReplayInput:
+    '''
+    Plays back a recording, no keys are pressed once it runs out.
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.seed, self.masks, self.segments = read_recording(path)
+        self.frame = 0
+        self.states = {}
+
+    def level_segments(self, level_number: int) -> List[LevelSegment]:
+        # every time the level was started in the recording
+        return [segment for segment in self.segments
+                if segment.level is None or segment.level == level_number]
+
+    def seek(self, segment: LevelSegment):
+        # play a single level from its first step
+        self.frame = segment.first_frame
+
+    @property
+    def finished(self) -> bool:
+        return self.frame >= len(self.masks)
+
+    def get_pressed(self) -> KeyState:
+        mask = self.masks[self.frame] if not self.finished else 0
+        if mask not in self.states:
+            self.states[mask] = KeyState(key for bit, key in enumerate(RECORDED_KEYS)
+                                         if mask & (1 << bit))
+        return self.states[mask]
+
+    def next_frame(self):
+        self.frame += 1
+
+
+def key_mask(keys: KeyState) -> int:
+    mask = 0
+    for bit, key in enumerate(RECORDED_KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+def write_recording(path: str, seed: int, masks: array, segments: List[LevelSegment]):
+    # consecutive frames with the same keys are stored as one run
+    runs = []
+    for mask in masks:
+        if runs and runs[-1][1] == mask:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, mask])
+
+    with open(path, 'wb') as file:
+        file.write(RECORDING_HEADER.pack(
+            RECORDING_MAGIC, RECORDING_VERSION, seed, len(masks), len(segments)))
+        for segment in segments:
+            file.write(RECORDING_SEGMENT.pack(segment.level, segment.seed,
+                                              segment.first_frame, segment.health, segment.ticks))
+        for count, mask in runs:
+            file.write(RECORDING_RUN.pack(count, mask))
+
+
+def read_recording(path: str) -> Tuple[int, array, List[LevelSegment]]:
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    magic, version, seed, frame_count = RECORDING_HEADER_V1.unpack_from(data)
+    if magic != RECORDING_MAGIC or version not in (1, RECORDING_VERSION):
+        raise ValueError(f'{path} is not an input recording')
+
+    if version == 1:
+        segments = [LevelSegment(None, seed, 0, 100, 0.0)]
+        offset = RECORDING_HEADER_V1.size
+    else:
+        *_, segment_count = RECORDING_HEADER.unpack_from(data)
+        offset = RECORDING_HEADER.size
+        segments = []
+        for _ in range(segment_count):
+            segments.append(LevelSegment(
+                *RECORDING_SEGMENT.unpack_from(data, offset)))
+            offset += RECORDING_SEGMENT.size
+
+    masks = array('B')
+    for count, mask in RECORDING_RUN.iter_unpack(data[offset:]):
+        masks.extend([mask] * count)
+    if len(masks) != frame_count:
+        raise ValueError(f'{path} is truncated')
+    return seed, masks, segments
+
+
+def parse_script(text: str) -> List[Tuple[int, int, int]]:
+    # 'right:0-600,space:40-42' holds right for frames 0 to 600 and jumps at 40
+    script = []
+    for entry in text.split(','):
+        if not entry.strip():
+            continue
+        name, frames = entry.strip().split(':')
+        first, _, last = frames.partition('-')
+        script.append((KEY_NAMES[name], int(first), int(last or first)))
+    return script
+
+
+# every key poll in the game goes through the current source
+source = KeyboardInput()
+
+
+def set_source(new_source):
+    global source
+    source = new_source
+
+
+def get_pressed():
+    return source.get_pressed()
+
+
+def next_frame():
+    # called once per simulation step, after the step
+    source.next_frame()
+
+
+def start_level(level_number: int, seed: int, health: int):
+    # called right before the first step of a level, recordings mark where it starts
+    if isinstance(source, RecordingInput):
+        source.start_level(level_number, seed, health)
+
+
+if __name__ == '__main__':
+    from main import main
+    main()
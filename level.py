@@ -1,31 +1,47 @@
 import pygame
+import inputs
 from decoration import Clouds, Sky, Water
-from enemy import Enemy
+from enemy import Enemy, EnemySystem
+from particles import ParticleManager
 from player import Player
-from tiles import Coin, Crate, Palm, StaticTile, Tile
-from settings import TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, CAMERA_BORDERS
-from support import import_csv_layout, import_cut_graphics, resource_path
-from typing import Callable, List
+from spatial import CollisionMap, SpatialGroup
+from streaming import LevelStreamer
+from tiles import AnimationClocks, Coin, Crate, Palm, StaticChunk, StaticLayer, StaticTile
+from settings import TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, CAMERA_BORDERS, STREAMING_MIN_COLUMNS, ACTIVITY_MARGIN
+from support import import_cut_graphics, import_image, resource_path
+from typing import Callable, Dict, List, Optional
+from random import Random, randrange
 from game_data import levels
+from level_loader import LayerData, load_layers
+from profiler import profiler
+from ui import get_font, text_cache
+
+
+# drawing order of the level, back to front
+DRAW_LAYERS = ('water', 'clouds', 'bg_palms', 'terrain', 'grass', 'crates',
+               'coins', 'fg_palms', 'enemies', 'player', 'particles')
 
 
 class Level:
-    def __init__(self, current_level: int, surface: pygame.Surface, create_overworld: Callable, change_coins: Callable, change_health: Callable) -> None:
+    def __init__(self, current_level: int, surface: pygame.Surface, create_overworld: Callable, change_coins: Callable, change_health: Callable, layers: Dict[str, LayerData] = None, seed: int = None, streaming: bool = None) -> None:
 
         # general setup
         self.display_surface = surface
         self.current_level = current_level
         self.world_shift = 0
 
+        # everything random in the level comes from this seed, so runs can be replayed
+        self.seed = seed if seed is not None else randrange(2 ** 32)
+        self.random = Random(self.seed)
+
         # sprite group setup
         # sprites in this group will be diplayed, other won't
         self.visible_sprites = CameraGroup()
         # sprites in this group will be updated, others will remain static
         self.active_sprites = ActiveGroup()
-        # sprites in this group will collide with player
-        self.collision_sprites = pygame.sprite.Group()
-        # sprites in this group will constrain enemies
-        self.enemy_constrains = pygame.sprite.Group()
+        # jump, landing and explosion effects, drawn and updated like other sprites
+        self.particles = ParticleManager(
+            [self.visible_sprites, self.active_sprites])
 
         # level setup
         level_data = levels[current_level]
@@ -34,58 +50,90 @@ class Level:
         self.create_overworld = create_overworld
 
         # level display
-        self.font = pygame.font.Font(None, 40)
-        self.text_surface = self.font.render(level_content, True, 'White')
+        self.font = get_font(None, 40)
+        self.text_surface = text_cache.render(
+            self.font, level_content, True, 'White')
         self.text_rect = self.text_surface.get_rect(
             center=(SCREEN_WIDTH//2, 20))
 
+        # compiled level file if it is up to date, source files otherwise
+        # layers can also come already loaded by the LevelPreloader
+        if layers is None:
+            layers = load_layers(level_data)
+
         # anything in background need to be added first
         # terrain_layout is needed to calculate decoration positions
-        terrain_layout = import_csv_layout(level_data['terrain'])
+        terrain_layout = layers['terrain']
+
+        # wide levels only keep the columns around the camera as sprites
+        if streaming is None:
+            streaming = terrain_layout.columns >= STREAMING_MIN_COLUMNS
+        self.streaming = streaming
 
         # decoration
         self.sky = Sky(8)
-        level_width = len(terrain_layout[0]) * TILE_SIZE
+        level_width = terrain_layout.columns * TILE_SIZE
+        self.terrain_tiles = import_cut_graphics(
+            resource_path('assets/graphics/terrain/terrain_tiles.png'))
+        self.grass_tiles = import_cut_graphics(resource_path(
+            'assets/graphics/decoration/grass/grass.png'))
+
+        # terrain cells and sprites in this map will collide with player
+        self.collision_map = CollisionMap(
+            terrain_layout.columns, terrain_layout.rows)
+        # enemies turn around before these cells
+        self.constraint_map = CollisionMap(
+            terrain_layout.columns, terrain_layout.rows)
+        for row_index, column_index, _ in layers['constraints'].cells:
+            self.constraint_map.set_solid(column_index, row_index)
+        # enemies are moved all at once by the system, not by active_sprites
+        self.enemy_system = EnemySystem(self.constraint_map)
+
+        # coins, palms and water showing the same frames share one clock
+        self.clocks = AnimationClocks()
+
+        self.set_draw_layer('water')
         self.water = Water(SCREEN_HEIGHT - 20, level_width,
-                           [self.visible_sprites])
-        self.clouds = Clouds(400, level_width, 20, [self.visible_sprites])
-
-        # background palms setup
-        bg_palms_layout = import_csv_layout(level_data['bg_palms'])
-        self.create_tile_group(bg_palms_layout, 'bg_palms')
-
-        # terrain setup
-        self.create_tile_group(terrain_layout, 'terrain')
-
-        # grass setup
-        grass_layout = import_csv_layout(level_data['grass'])
-        self.create_tile_group(grass_layout, 'grass')
+                           [self.visible_sprites], spawn=not self.streaming,
+                           clock=self.clocks.get('assets/graphics/decoration/water'))
+        self.set_draw_layer('clouds')
+        self.clouds = Clouds(400, level_width, 20, [
+                             self.visible_sprites], self.random)
+
+        # terrain and grass never change, they are pre-rendered in chunks
+        # drawn between background palms and crates
+        self.static_layer = StaticLayer(
+            level_width, terrain_layout.rows * TILE_SIZE, [self.visible_sprites])
+
+        self.coins_sprites = SpatialGroup()
+        self.enemies_sprites = SpatialGroup()
+        self.goal = SpatialGroup()
+        # group that collects the sprites of each layer
+        self.layer_groups = {'coins': self.coins_sprites,
+                             'enemies': self.enemies_sprites, 'player': self.goal}
+
+        if self.streaming:
+            # solid terrain is known for the whole level, its tiles are streamed
+            for row_index, column_index, _ in terrain_layout.cells:
+                self.collision_map.set_solid(column_index, row_index)
+        else:
+            # background palms, terrain, grass, crates, coins, foreground palms, enemies
+            for layout_type in ('bg_palms', 'terrain', 'grass', 'crates', 'coins', 'fg_palms', 'enemies'):
+                self.create_tile_group(layers[layout_type], layout_type)
 
-        # crates setup
-        crates_layout = import_csv_layout(level_data['crates'])
-        self.create_tile_group(crates_layout, 'crates')
-
-        # crates setup
-        coins_layout = import_csv_layout(level_data['coins'])
-        self.coins_sprites = self.create_tile_group(coins_layout, 'coins')
-
-        # foreground palms setup
-        fg_palms_layout = import_csv_layout(level_data['fg_palms'])
-        self.create_tile_group(fg_palms_layout, 'fg_palms')
-
-        # enemy setup
-        enemies_layout = import_csv_layout(level_data['enemies'])
-        self.enemies_sprites = self.create_tile_group(
-            enemies_layout, 'enemies')
+        # player setup
+        self.create_tile_group(layers['player'], 'player', change_health)
 
-        # constraint
-        constraints_layout = import_csv_layout(level_data['constraints'])
-        self.create_tile_group(constraints_layout, 'constraints')
+        # everything but the player and particles is culled by column from now on,
+        # enemies report their moves to the camera group when they are synced
+        self.visible_sprites.build_index(self.active_sprites)
+        self.set_draw_layer('particles')
 
-        # player setup
-        player_layout = import_csv_layout(level_data['player'])
-        self.goal = self.create_tile_group(
-            player_layout, 'player', change_health)
+        # the camera starts on the player, the first step wakes and spawns around it
+        self.visible_sprites.update_camera(self.player)
+        if self.streaming:
+            self.streamer = LevelStreamer(self, layers)
+            self.streamer.update(self.visible_sprites.view_rect())
 
         # ui
         self.change_coins = change_coins
@@ -95,75 +143,86 @@ class Level:
         # self.stomp_sound = pygame.mixer.Sound(
         #     resource_path('assets/audio/effects/stomp.wav'))
 
-    def create_tile_group(self, layout: List, layout_type: str, change_health: Callable = None):
-        sprite_group = pygame.sprite.Group()
+    def set_draw_layer(self, layout_type: str):
+        # sprites made from now on are drawn in the layer of layout_type
+        if layout_type in DRAW_LAYERS:
+            self.visible_sprites.draw_layer = DRAW_LAYERS.index(layout_type)
+
+    def create_tile_group(self, layout: LayerData, layout_type: str, change_health: Callable = None):
+        self.set_draw_layer(layout_type)
+        for row_index, column_index, cell in layout.cells:
+            self.create_tile(layout_type, row_index, column_index,
+                             cell, change_health)
+
+    def create_tile(self, layout_type: str, row_index: int, column_index: int, cell: int, change_health: Callable = None, rng: Random = None):
+        # returns the sprite made for the cell, if any
+        # sprites of coins, enemies and the goal also go in layer_groups,
+        # which are used for collision queries with the player
+        x = column_index * TILE_SIZE
+        y = row_index * TILE_SIZE
+        sprite = None
         if layout_type == 'terrain':
-            terrain_tile_list = import_cut_graphics(
-                resource_path('assets/graphics/terrain/terrain_tiles.png'))
+            tile_surface = self.terrain_tiles[cell]
+            self.static_layer.add(tile_surface, (x, y))
+            self.collision_map.set_solid(column_index, row_index)
         if layout_type == 'grass':
-            grass_tile_list = import_cut_graphics(resource_path(
-                'assets/graphics/decoration/grass/grass.png'))
-
-        for row_index, row in enumerate(layout):
-            for column_index, cell in enumerate(row):
-                x = column_index * TILE_SIZE
-                y = row_index * TILE_SIZE
-                if cell != '-1':
-                    if layout_type == 'terrain':
-                        tile_surface = terrain_tile_list[int(cell)]
-                        StaticTile((x, y), TILE_SIZE, tile_surface, [
-                                   self.visible_sprites, self.collision_sprites])
-                    if layout_type == 'grass':
-                        tile_surface = grass_tile_list[int(cell)]
-                        StaticTile((x, y), TILE_SIZE, tile_surface,
-                                   [self.visible_sprites])
-                    if layout_type == 'crates':
-                        Crate((x, y), TILE_SIZE, [
-                              self.visible_sprites, self.collision_sprites])
-                    if layout_type == 'coins':
-                        if cell == '0':
-                            sprite = Coin((x, y), TILE_SIZE, 'assets/graphics/coins/gold',
-                                          5, [self.visible_sprites])
-                        else:
-                            sprite = Coin(
-                                (x, y), TILE_SIZE, 'assets/graphics/coins/silver', 1, [self.visible_sprites])
-                        sprite_group.add(sprite)
-                    if layout_type == 'fg_palms':
-                        if cell == '0':
-                            Palm((x, y), TILE_SIZE, 'assets/graphics/terrain/palm_small',
-                                 38, [self.visible_sprites, self.collision_sprites])
-                        if cell == '1':
-                            Palm((x, y), TILE_SIZE, 'assets/graphics/terrain/palm_large',
-                                 64, [self.visible_sprites, self.collision_sprites])
-                    if layout_type == 'bg_palms':
-                        Palm((x, y), TILE_SIZE, 'assets/graphics/terrain/palm_bg',
-                             64, [self.visible_sprites])
-                    if layout_type == 'enemies':
-                        sprite = Enemy((x, y), TILE_SIZE, [
-                                       self.visible_sprites, self.active_sprites], self.enemy_constrains)
-                        sprite_group.add(sprite)
-                    if layout_type == 'constraints':
-                        Tile((x, y), TILE_SIZE, [self.enemy_constrains])
-                    if layout_type == 'player':
-                        if cell == '0':
-                            self.player = Player((x, y),
-                                                 self.display_surface,
-                                                 change_health,
-                                                 [self.visible_sprites,
-                                                     self.active_sprites],
-                                                 self.collision_sprites,
-                                                 self.enemies_sprites
-                                                 )
-                        if cell == '1':
-                            hat_surface = pygame.image.load(resource_path(
-                                'assets/graphics/character/hat.png')).convert_alpha()
-                            sprite = StaticTile((x, y), TILE_SIZE, hat_surface, [
-                                self.visible_sprites])
-                            sprite_group.add(sprite)
-        return sprite_group
+            tile_surface = self.grass_tiles[cell]
+            self.static_layer.add(tile_surface, (x, y))
+        if layout_type == 'crates':
+            sprite = Crate((x, y), TILE_SIZE,
+                           [self.visible_sprites])
+            self.collision_map.add(sprite)
+        if layout_type == 'coins':
+            if cell == 0:
+                path = 'assets/graphics/coins/gold'
+                sprite = Coin((x, y), TILE_SIZE, path, 5, [
+                              self.visible_sprites], self.clocks.get(path))
+            else:
+                path = 'assets/graphics/coins/silver'
+                sprite = Coin((x, y), TILE_SIZE, path, 1, [
+                              self.visible_sprites], self.clocks.get(path))
+            self.coins_sprites.add(sprite)
+        if layout_type == 'fg_palms':
+            if cell == 0:
+                path = 'assets/graphics/terrain/palm_small'
+                sprite = Palm((x, y), TILE_SIZE, path, 38, [
+                              self.visible_sprites], self.clocks.get(path))
+                self.collision_map.add(sprite)
+            if cell == 1:
+                path = 'assets/graphics/terrain/palm_large'
+                sprite = Palm((x, y), TILE_SIZE, path, 64, [
+                              self.visible_sprites], self.clocks.get(path))
+                self.collision_map.add(sprite)
+        if layout_type == 'bg_palms':
+            path = 'assets/graphics/terrain/palm_bg'
+            sprite = Palm((x, y), TILE_SIZE, path, 64, [
+                          self.visible_sprites], self.clocks.get(path))
+        if layout_type == 'enemies':
+            sprite = Enemy((x, y), TILE_SIZE, [
+                           self.visible_sprites], rng or self.random)
+            self.enemies_sprites.add(sprite)
+            self.enemy_system.add(sprite)
+        if layout_type == 'player':
+            if cell == 0:
+                self.player = Player((x, y),
+                                     self.display_surface,
+                                     change_health,
+                                     [self.visible_sprites,
+                                         self.active_sprites],
+                                     self.collision_map,
+                                     self.enemies_sprites,
+                                     self.particles
+                                     )
+            if cell == 1:
+                hat_surface = import_image(
+                    'assets/graphics/character/hat.png')
+                sprite = StaticTile((x, y), TILE_SIZE, hat_surface, [
+                    self.visible_sprites])
+                self.goal.add(sprite)
+        return sprite
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = inputs.get_pressed()
         if keys[pygame.K_RETURN]:
             # unlocks new level
             self.create_overworld(self.current_level, self.new_max_level)
@@ -171,31 +230,77 @@ class Level:
             # keep new level unchanged
             self.create_overworld(self.current_level, 0)
 
-    def run(self):
+    def update(self):
+        # one simulation step, nothing is drawn here
+        self.visible_sprites.store_positions()
+        start = profiler.start()
         self.input()
-        self.sky.draw(self.display_surface)
-        self.display_surface.blit(self.text_surface, self.text_rect)
+        profiler.stop('input', start)
 
         # player
+        start = profiler.start()
         self.check_coin_collisions()
-
-        self.active_sprites.run()
-        self.visible_sprites.custom_draw(self.player)
+        profiler.stop('coins', start)
+
+        # one tick per animation, however many coins, palms and water tiles show it
+        self.clocks.tick()
+
+        # enemies run before the player, as they did in active_sprites
+        start = profiler.start()
+        self.enemy_system.update(self.visible_sprites.view_rect())
+        profiler.stop('enemies', start)
+
+        activity_rect = self.activity_rect()
+        if activity_rect is not None:
+            self.particles.release_outside(activity_rect)
+        self.active_sprites.run(activity_rect)
+        self.visible_sprites.update_camera(self.player)
+        if self.streaming:
+            start = profiler.start()
+            self.streamer.update(self.visible_sprites.view_rect())
+            profiler.stop('streaming', start)
 
         self.check_death()
         self.check_win()
 
+    def activity_rect(self) -> Optional[pygame.Rect]:
+        # sprites outside this rect sleep, the player is always inside it
+        if ACTIVITY_MARGIN is None:
+            return None
+        return self.visible_sprites.view_rect().inflate(
+            ACTIVITY_MARGIN * 2, ACTIVITY_MARGIN * 2)
+
+    def sleeping_counts(self) -> Dict[str, int]:
+        # how many entities the last step skipped, by kind
+        return {'enemies': self.enemy_system.sleeping_count,
+                'active': self.active_sprites.sleeping_count}
+
+    def draw(self, alpha: float = 1.0):
+        # alpha is how far the frame is between the previous and the last simulation step
+        start = profiler.start()
+        self.sky.draw(self.display_surface)
+        profiler.stop('sky', start)
+        self.display_surface.blit(self.text_surface, self.text_rect)
+        start = profiler.start()
+        self.player.draw_dust()
+        self.visible_sprites.custom_draw(alpha)
+        profiler.stop('camera', start)
+
+    def run(self):
+        self.update()
+        self.draw()
+
     def check_death(self):
         if self.player.rect.top > SCREEN_HEIGHT:
             self.create_overworld(self.current_level, 0)
 
     def check_win(self):
-        if pygame.sprite.spritecollide(self.player, self.goal, False):
+        if self.goal.collide(self.player.rect):
             self.create_overworld(self.current_level, self.new_max_level)
 
     def check_coin_collisions(self):
-        collided_coins: List[Coin] = pygame.sprite.spritecollide(
-            self.player, self.coins_sprites, True)
+        collided_coins: List[Coin] = self.coins_sprites.collide(
+            self.player.rect, dokill=True)
         if collided_coins:
             self.coin_sound.play()
             for coin in collided_coins:
@@ -203,10 +308,28 @@ class Level:
 
 
 class CameraGroup(pygame.sprite.Group):
-    def __init__(self):
+    def __init__(self, bucket_width: int = TILE_SIZE * 4, cull_margin: int = TILE_SIZE):
+        # set before super().__init__() as adding sprites needs them
+        self.draw_order = {}
+        self.next_order = 0
+        # sprites are drawn by layer first, then in the order they were added
+        self.draw_layer = 0
+        self.buckets = {}
+        self.bucket_columns = {}
+        self.dynamic_sprites = {}
+        # positions before the last simulation step, used to interpolate drawing
+        self.previous_positions = {}
+        # positions of bucketed sprites when they were indexed or last refreshed
+        self.indexed_positions = {}
+        self.bucket_width = bucket_width
+        self.cull_margin = cull_margin
+        # culling counters of the last custom_draw
+        self.visible_count = 0
+        self.total_count = 0
         super().__init__()
         self.display_surface = pygame.display.get_surface()
         self.offset = pygame.math.Vector2(100, 300)
+        self.previous_offset = self.offset.copy()
 
         # center camera setup
         # camera follows Player always
@@ -228,6 +351,103 @@ class CameraGroup(pygame.sprite.Group):
         self.camera_rect = pygame.Rect(
             camera_left, camera_top, camera_width, camera_height)
 
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.draw_order[sprite] = (self.draw_layer, self.next_order)
+        self.next_order += 1
+        # sprites added after build_index (particles) are checked every frame
+        self.dynamic_sprites[sprite] = None
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.draw_order.pop(sprite, None)
+        self.dynamic_sprites.pop(sprite, None)
+        self.indexed_positions.pop(sprite, None)
+        # pooled sprites can come back somewhere else
+        self.previous_positions.pop(sprite, None)
+        columns = self.bucket_columns.pop(sprite, None)
+        if columns is not None:
+            for column in columns:
+                bucket = self.buckets[column]
+                bucket.pop(sprite, None)
+                if not bucket:
+                    del self.buckets[column]
+
+    def build_index(self, *moving_groups: pygame.sprite.Group):
+        # sprites that do not move on their own are bucketed by column once per level
+        self.buckets = {}
+        self.bucket_columns = {}
+        for sprite in self.sprites():
+            if any(sprite in group for group in moving_groups):
+                continue
+            self.index(sprite)
+
+    def index(self, sprite):
+        # also used for sprites added later, like streamed columns
+        del self.dynamic_sprites[sprite]
+        self.indexed_positions[sprite] = sprite.rect.topleft
+        self.bucket_columns[sprite] = self.sprite_columns(sprite)
+        for column in self.bucket_columns[sprite]:
+            self.buckets.setdefault(column, {})[sprite] = None
+
+    def refresh(self, sprite):
+        # called by bucketed sprites after they moved, like SpatialGroup.refresh
+        columns = self.bucket_columns.get(sprite)
+        if columns is None:
+            # not indexed yet, it is bucketed where it is when it is
+            return
+        # the first move of the step is where it was when the step started
+        self.previous_positions.setdefault(
+            sprite, self.indexed_positions[sprite])
+        self.indexed_positions[sprite] = sprite.rect.topleft
+        new_columns = self.sprite_columns(sprite)
+        if new_columns == columns:
+            return
+        for column in columns:
+            bucket = self.buckets[column]
+            del bucket[sprite]
+            if not bucket:
+                del self.buckets[column]
+        self.bucket_columns[sprite] = new_columns
+        for column in new_columns:
+            self.buckets.setdefault(column, {})[sprite] = None
+
+    def sprite_columns(self, sprite) -> range:
+        draw_rect = self.draw_rect(sprite)
+        first = draw_rect.left // self.bucket_width
+        last = (draw_rect.right - 1) // self.bucket_width
+        return range(first, last + 1)
+
+    @staticmethod
+    def draw_rect(sprite) -> pygame.Rect:
+        # chunks know their size without rendering their image
+        if isinstance(sprite, StaticChunk):
+            return sprite.rect
+        # images are blitted at rect.topleft but can be bigger than rect (palms, clouds)
+        return pygame.Rect(sprite.rect.topleft, sprite.image.get_size())
+
+    def view_rect(self) -> pygame.Rect:
+        # level area on screen, grown by the cull margin
+        return pygame.Rect(
+            self.offset, self.display_surface.get_size()).inflate(
+            self.cull_margin * 2, self.cull_margin * 2)
+
+    def sprites_in_view(self):
+        view_rect = self.view_rect()
+
+        candidates = dict(self.dynamic_sprites)
+        first = view_rect.left // self.bucket_width
+        last = (view_rect.right - 1) // self.bucket_width
+        for column in range(first, last + 1):
+            bucket = self.buckets.get(column)
+            if bucket:
+                candidates.update(bucket)
+
+        visible = [sprite for sprite in candidates
+                   if view_rect.colliderect(self.draw_rect(sprite))]
+        visible.sort(key=self.draw_order.__getitem__)
+        return visible
+
     def offset_from_player(self, player: Player):
         # player offset
         self.offset.x = player.rect.centerx - self.half_width
@@ -248,23 +468,68 @@ class CameraGroup(pygame.sprite.Group):
             self.camera_rect.left - CAMERA_BORDERS['left'],
             self.camera_rect.top - CAMERA_BORDERS['top'])
 
-    def custom_draw(self, player: Player):
+    def store_positions(self):
+        # only the player and particles are snapshot here,
+        # bucketed sprites that move add their position in refresh()
+        self.previous_positions = {
+            sprite: sprite.rect.topleft for sprite in self.dynamic_sprites}
+        self.previous_offset = self.offset.copy()
 
+    def update_camera(self, player: Player):
         # self.offset_from_player(player)
         self.offset_from_level(player)
 
-        for sprite in self.sprites():
-            offset_pos = sprite.rect.topleft - self.offset
-            self.display_surface.blit(sprite.image, offset_pos)
+    def interpolated_offset(self, alpha: float = 1.0) -> pygame.math.Vector2:
+        return self.previous_offset.lerp(self.offset, alpha)
+
+    def custom_draw(self, alpha: float = 1.0):
+        offset = self.interpolated_offset(alpha)
+
+        visible = self.sprites_in_view()
+        self.visible_count = len(visible)
+        self.total_count = len(self.draw_order)
+        for sprite in visible:
+            pos = pygame.math.Vector2(sprite.rect.topleft)
+            previous_pos = self.previous_positions.get(sprite)
+            if previous_pos is not None:
+                pos = pos.lerp(previous_pos, 1 - alpha)
+            self.display_surface.blit(sprite.image, pos - offset)
 
 
 class ActiveGroup(pygame.sprite.Group):
+    '''
+    Sprites that run every step. Sprites outside the region given to run()
+    sleep: they are skipped until they are inside it again.
+    '''
+
     def __init__(self):
         super().__init__()
-
-    def run(self):
+        # sprites skipped by the last run
+        self.sleeping_count = 0
+
+    def run(self, region: pygame.Rect = None):
+        if profiler.enabled:
+            self.profiled_run(region)
+            return
+        sleeping = 0
+        for sprite in self.sprites():
+            if region is None or region.colliderect(sprite.rect):
+                sprite.run()
+            else:
+                sleeping += 1
+        self.sleeping_count = sleeping
+
+    def profiled_run(self, region: pygame.Rect = None):
+        # time is split by sprite type: player, particles
+        sleeping = 0
         for sprite in self.sprites():
-            sprite.run()
+            if region is None or region.colliderect(sprite.rect):
+                start = profiler.start()
+                sprite.run()
+                profiler.stop('run ' + type(sprite).__name__, start)
+            else:
+                sleeping += 1
+        self.sleeping_count = sleeping
 
 
 if __name__ == '__main__':
@@ -0,0 +1,300 @@
+from array import array
+import base64
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import gzip
+from os import fdopen, remove, replace, stat
+from os.path import dirname
+import struct
+import sys
+from tempfile import mkstemp
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+import zlib
+
+from game_data import levels
+from support import import_csv_layout, resource_path
+
+# every tile layer of a level, in the order they are stored
+LAYERS = ('terrain', 'bg_palms', 'grass', 'crates', 'coins',
+          'fg_palms', 'enemies', 'constraints', 'player')
+
+# Tiled stores flip flags in the highest bits of a global tile id
+GID_MASK = 0x1FFFFFFF
+
+# magic, version, columns, rows, entry count, source stamp, payload checksum
+HEADER = struct.Struct('<4sHIIIII')
+MAGIC = b'PLVL'
+VERSION = 1
+
+
+class LayerData:
+    '''
+    Tile layer reduced to its non empty cells.
+    cells holds (row, column, tile id) tuples in row order,
+    the same order the CSV grid was walked in before.
+    '''
+
+    def __init__(self, columns: int, rows: int, cells: List[Tuple[int, int, int]]) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.cells = cells
+
+
+def source_files(level_data: dict) -> List[str]:
+    # a level is made from a single TMX map or from one CSV file per layer
+    if 'tmx' in level_data:
+        return [level_data['tmx']]
+    return [level_data[layer] for layer in LAYERS]
+
+
+def source_stamp(level_data: dict) -> int:
+    # changes whenever one of the source files is edited or replaced
+    signature = []
+    for path in source_files(level_data):
+        info = stat(resource_path(path))
+        signature.append((path, info.st_size, info.st_mtime_ns))
+    return zlib.crc32(repr(signature).encode())
+
+
+def layer_from_csv(path: str) -> LayerData:
+    layout = import_csv_layout(path)
+    cells = []
+    for row_index, row in enumerate(layout):
+        for column_index, cell in enumerate(row):
+            if cell != '-1':
+                cells.append((row_index, column_index, int(cell)))
+    return LayerData(len(layout[0]), len(layout), cells)
+
+
+def load_csv_layers(level_data: dict) -> Dict[str, LayerData]:
+    return {layer: layer_from_csv(level_data[layer]) for layer in LAYERS}
+
+
+def decode_tmx_data(text: str, encoding: Optional[str], compression: Optional[str]) -> array:
+    # global tile ids of a layer, row by row
+    if encoding == 'csv':
+        return array('I', map(int, text.split(',')))
+    if encoding != 'base64':
+        raise ValueError(f'unsupported TMX layer encoding: {encoding}')
+
+    data = base64.b64decode(text.strip())
+    if compression == 'zlib':
+        data = zlib.decompress(data)
+    elif compression == 'gzip':
+        data = gzip.decompress(data)
+    elif compression:
+        raise ValueError(f'unsupported TMX layer compression: {compression}')
+    gids = array('I')
+    gids.frombytes(data)
+    if sys.byteorder != 'little':
+        gids.byteswap()
+    return gids
+
+
+def layer_from_gids(gids: array, columns: int, rows: int, first_gids: List[int]) -> LayerData:
+    # tile ids in the CSV files are relative to the tileset the tile belongs to
+    first_gids = sorted(first_gids)
+    cells = []
+    for index, gid in enumerate(gids):
+        if gid:
+            gid &= GID_MASK
+            first_gid = first_gids[bisect_right(first_gids, gid) - 1]
+            row_index, column_index = divmod(index, columns)
+            cells.append((row_index, column_index, gid - first_gid))
+    return LayerData(columns, rows, cells)
+
+
+def load_tmx_layers(path: str) -> Dict[str, LayerData]:
+    first_gids = []
+    layers = {}
+    columns = rows = 0
+    layer_name = None
+
+    for event, element in iterparse(resource_path(path), events=('start', 'end')):
+        if event == 'start':
+            if element.tag == 'map':
+                columns = int(element.get('width'))
+                rows = int(element.get('height'))
+            elif element.tag == 'tileset':
+                first_gids.append(int(element.get('firstgid')))
+            elif element.tag == 'layer':
+                layer_name = element.get('name')
+        elif element.tag == 'data' and layer_name in LAYERS:
+            gids = decode_tmx_data(element.text, element.get(
+                'encoding'), element.get('compression'))
+            layers[layer_name] = layer_from_gids(
+                gids, columns, rows, first_gids)
+            # layer data is not needed anymore, keep memory flat
+            element.clear()
+
+    for layer in LAYERS:
+        layers.setdefault(layer, LayerData(columns, rows, []))
+    return layers
+
+
+def load_source_layers(level_data: dict) -> Dict[str, LayerData]:
+    if 'tmx' in level_data:
+        return load_tmx_layers(level_data['tmx'])
+    return load_csv_layers(level_data)
+
+
+def compile_level(level_data: dict, layers: Dict[str, LayerData] = None) -> str:
+    # layers already read from the source files can be given to skip reading them again
+    if layers is None:
+        layers = load_source_layers(level_data)
+    terrain = layers['terrain']
+
+    # one (layer, row, column, id) entry per non empty cell
+    entries = array('H')
+    for layer_index, layer in enumerate(LAYERS):
+        for row_index, column_index, cell in layers[layer].cells:
+            entries.extend((layer_index, row_index, column_index, cell))
+    if sys.byteorder != 'little':
+        entries.byteswap()
+    payload = entries.tobytes()
+
+    header = HEADER.pack(MAGIC, VERSION, terrain.columns, terrain.rows,
+                         len(entries) // 4, source_stamp(level_data), zlib.crc32(payload))
+    path = resource_path(level_data['compiled'])
+    # written next to the file and renamed, so a game loading the level
+    # at the same time never reads half a file
+    handle, temporary = mkstemp(dir=dirname(path) or '.', suffix='.tmp')
+    try:
+        with fdopen(handle, 'wb') as file:
+            file.write(header)
+            file.write(payload)
+        replace(temporary, path)
+    except BaseException:
+        remove(temporary)
+        raise
+    return path
+
+
+def load_compiled_layers(level_data: dict) -> Optional[Dict[str, LayerData]]:
+    # None when the compiled file is missing, stale or damaged
+    try:
+        with open(resource_path(level_data['compiled']), 'rb') as file:
+            data = file.read()
+        stamp = source_stamp(level_data)
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+
+    magic, version, columns, rows, count, file_stamp, checksum = HEADER.unpack_from(
+        data)
+    payload = data[HEADER.size:]
+    if (magic != MAGIC or version != VERSION or file_stamp != stamp
+            or len(payload) != count * 8 or zlib.crc32(payload) != checksum):
+        return None
+
+    entries = array('H')
+    entries.frombytes(payload)
+    if sys.byteorder != 'little':
+        entries.byteswap()
+
+    layers = {layer: LayerData(columns, rows, []) for layer in LAYERS}
+    layer_cells = [layers[layer].cells for layer in LAYERS]
+    for index in range(0, len(entries), 4):
+        layer_cells[entries[index]].append(
+            (entries[index + 1], entries[index + 2], entries[index + 3]))
+    return layers
+
+
+def load_layers(level_data: dict) -> Dict[str, LayerData]:
+    # a missing or stale compiled file is written again from the sources,
+    # so only the first load after a change reads them
+    layers = load_compiled_layers(level_data)
+    if layers is None:
+        layers = load_source_layers(level_data)
+        if 'compiled' in level_data:
+            try:
+                compile_level(level_data, layers)
+            except OSError:
+                # read only installs keep loading the sources
+                pass
+    return layers
+
+
+def time_loaders(level_data: dict, repeat: int = 20) -> Dict[str, float]:
+    # best load time in milliseconds of every source the level has
+    loaders = {'compiled': load_compiled_layers}
+    if all(layer in level_data for layer in LAYERS):
+        loaders['csv'] = load_csv_layers
+    if 'tmx' in level_data:
+        loaders['tmx'] = lambda data: load_tmx_layers(data['tmx'])
+
+    timings = {}
+    for name, loader in loaders.items():
+        best = None
+        for _ in range(repeat):
+            start = perf_counter()
+            layers = loader(level_data)
+            elapsed = (perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        if layers is not None:
+            timings[name] = best
+    return timings
+
+
+class LevelPreloader:
+    '''
+    Reads and parses level files in a worker thread while the player is on the overworld.
+    Only layer data is prepared here, surfaces are still created on the main thread by Level.
+    '''
+
+    def __init__(self, max_prepared: int = 2) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='level-preload')
+        self.max_prepared = max_prepared
+        # level number -> future with its layers, oldest first
+        self.prepared: 'OrderedDict[int, Future]' = OrderedDict()
+
+    def prepare(self, level_number: int):
+        if level_number not in levels:
+            return
+        if level_number in self.prepared:
+            self.prepared.move_to_end(level_number)
+        else:
+            self.prepared[level_number] = self.executor.submit(
+                load_layers, levels[level_number])
+
+        # the icon moved on, levels still waiting in the queue are not needed anymore
+        for other_number, future in list(self.prepared.items()):
+            if other_number != level_number and future.cancel():
+                del self.prepared[other_number]
+
+        while len(self.prepared) > self.max_prepared:
+            _, future = self.prepared.popitem(last=False)
+            future.cancel()
+
+    def take(self, level_number: int) -> Dict[str, LayerData]:
+        # waits for a load in progress, loads right away if it was never prepared
+        future = self.prepared.pop(level_number, None)
+        if future is None or future.cancelled():
+            return load_layers(levels[level_number])
+        return future.result()
+
+    def shutdown(self):
+        for future in self.prepared.values():
+            future.cancel()
+        self.prepared.clear()
+        self.executor.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    # compile every level that has its source files available
+    # with --compare, also print how long each source takes to load
+    for level_number, level_data in levels.items():
+        try:
+            path = compile_level(level_data)
+        except FileNotFoundError as error:
+            print(f'level {level_number}: skipped, {error.filename} not found')
+            continue
+        print(f'level {level_number}: {path}')
+        if '--compare' in sys.argv:
+            for name, elapsed in time_loaders(level_data).items():
+                print(f'    {name}: {elapsed:.2f} ms')
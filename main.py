@@ -1,20 +1,33 @@
 import pygame
+from argparse import ArgumentParser
+from random import Random, randrange
 from sys import exit
+from typing import List, Optional
+import game_time
+import inputs
 from overworld import Overworld
 from settings import *
 from level import Level
+from level_loader import LevelPreloader
+from profiler import profiler
 from support import resource_path
 from ui import UI
 
 
 class Game:
-    def __init__(self) -> None:
+    def __init__(self, seed: int = None) -> None:
+        # every level gets its seed from here, so a whole session can be replayed
+        self.seed = seed if seed is not None else randrange(2 ** 32)
+        self.random = Random(self.seed)
         self.max_level: int = 0
         self.max_health: int = 100
         self.cur_health: int = 100
         self.coins: int = 0
         self.screen = pygame.display.get_surface()
 
+        # levels are loaded in the background while on the overworld
+        self.preloader = LevelPreloader()
+
         # user interface
         self.ui = UI(self.screen)
         # audio
@@ -27,14 +40,22 @@ class Game:
 
         # overworld setup
         self.overworld = Overworld(
-            0, self.max_level, self.screen, self.create_level)
+            0, self.max_level, self.screen, self.create_level, self.preloader)
         self.status = 'overworld'
+        self.level_start = None
+        # set by the step that switched between overworld and level
+        self.switched = False
         self.overworld_bg_music.play(loops=-1)
 
     def create_level(self, current_level: int):
+        seed = self.random.randrange(2 ** 32)
         self.level = Level(current_level, self.screen,
-                           self.create_overworld, self.change_coins, self.change_health)
+                           self.create_overworld, self.change_coins, self.change_health,
+                           self.preloader.take(current_level), seed)
+        # marked in the recording on the first step of the level
+        self.level_start = (current_level, seed, self.cur_health)
         self.status = 'level'
+        self.switched = True
         self.overworld_bg_music.stop()
         self.level_bg_music.play(loops=-1)
 
@@ -42,9 +63,9 @@ class Game:
         # check if the next level is unlocked
         if new_max_level > self.max_level:
             self.max_level = new_max_level
-        self.overworld = Overworld(
-            current_level, self.max_level, self.screen, self.create_level)
+        self.overworld.reset(current_level, self.max_level)
         self.status = 'overworld'
+        self.switched = True
         self.level_bg_music.stop()
         self.overworld_bg_music.play(loops=-1)
 
@@ -59,39 +80,116 @@ class Game:
             self.coins = 0
             self.cur_health = 100
             self.max_level = 0
-            self.overworld = Overworld(
-                0, self.max_level, self.screen, self.create_level)
+            self.overworld.reset(0, self.max_level)
             self.status = 'overworld'
+            self.switched = True
             self.level_bg_music.stop()
             self.overworld_bg_music.play(loops=-1)
 
-    def run(self):
+    def update(self):
+        if self.status == 'overworld':
+            self.overworld.update()
+        else:
+            if self.level_start is not None:
+                inputs.start_level(*self.level_start)
+                self.level_start = None
+            self.level.update()
+            self.check_game_over()
+        inputs.next_frame()
+        game_time.advance(1000 / SIMULATION_HZ)
+
+    def draw(self, alpha: float = 1.0) -> Optional[List[pygame.Rect]]:
+        # returns the changed areas of the screen, None when all of it changed
         if self.status == 'overworld':
-            self.overworld.run()
+            if OVERWORLD_DIRTY_RECTS and not profiler.enabled:
+                return self.overworld.draw_dirty()
+            # the profiler panel is drawn over the screen, redraw everything
+            self.overworld.full_redraw = True
+            self.overworld.draw()
         else:
-            self.level.run()
+            self.level.draw(alpha)
+            start = profiler.start()
             self.ui.show_health(self.cur_health, self.max_health)
             self.ui.show_coins(self.coins)
-            self.check_game_over()
+            profiler.stop('ui', start)
+        return None
+
+    def run(self):
+        self.update()
+        self.draw()
 
 
 def main():
+    parser = ArgumentParser(description='Platformer game.')
+    parser.add_argument('--seed', type=int, help='seed for everything random in the levels')
+    parser.add_argument('--record', metavar='PATH', help='save the keys pressed to PATH')
+    parser.add_argument('--replay', metavar='PATH', help='play back a recording instead of the keyboard')
+    args = parser.parse_args()
+
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     clock = pygame.time.Clock()
 
-    game = Game()
+    # input source and seed decide everything the simulation does
+    if args.replay:
+        source = inputs.ReplayInput(args.replay)
+        seed = source.seed
+    else:
+        source = inputs.KeyboardInput()
+        seed = args.seed if args.seed is not None else randrange(2 ** 32)
+    if args.record:
+        source = inputs.RecordingInput(source, seed)
+    inputs.set_source(source)
+    # timers count simulation steps so a replay sees the same times
+    game_time.use_simulated_time()
+
+    game = Game(seed)
+
+    # fixed timestep, the simulation catches up with the time spent rendering
+    step = 1 / SIMULATION_HZ
+    accumulator = 0.0
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if args.record:
+                    source.save(args.record)
+                game.preloader.shutdown()
                 pygame.quit()
                 exit()
-
-        game.run()
-
-        pygame.display.update()
-        clock.tick(60)
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                profiler.toggle()
+            if event.type == pygame.WINDOWEXPOSED:
+                # the window contents may be gone, dirty rects are not enough
+                game.overworld.full_redraw = True
+
+        accumulator += clock.tick(MAX_FPS) / 1000
+        steps = 0
+        while accumulator >= step and steps < MAX_STEPS_PER_FRAME:
+            game.update()
+            accumulator -= step
+            steps += 1
+            if game.switched:
+                # the time spent building the new scene is not game time,
+                # it starts with no steps to catch up
+                game.switched = False
+                accumulator = 0.0
+                clock.tick()
+                break
+        if steps == MAX_STEPS_PER_FRAME:
+            # too far behind, drop the time that cannot be caught up
+            accumulator = min(accumulator, step)
+
+        dirty_rects = game.draw(accumulator / step)
+        profiler.draw(screen)
+
+        start = profiler.start()
+        if dirty_rects is None:
+            pygame.display.update()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        profiler.stop('display', start)
+        profiler.end_frame()
 
 
 if __name__ == '__main__':
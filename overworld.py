@@ -1,18 +1,23 @@
-from typing import Callable
+from typing import Callable, List
 import pygame
+import game_time
+import inputs
 from game_data import levels
-from support import import_folder, resource_path
+from level_loader import LevelPreloader
+from support import asset_cache, import_folder, import_image, resource_path
 from decoration import Sky
+from tiles import AnimationClock, AnimationClocks
 
 
 class Overworld:
-    def __init__(self, start_level: int, max_level: int, surface: pygame.Surface, create_level: Callable) -> None:
+    def __init__(self, start_level: int, max_level: int, surface: pygame.Surface, create_level: Callable, preloader: LevelPreloader = None) -> None:
 
         # setup
         self.display_surface = surface
         self.max_level = max_level
         self.current_level = start_level
         self.create_level = create_level
+        self.preloader = preloader
 
         # movement logic
         self.move_direction = pygame.math.Vector2(0, 0)
@@ -24,21 +29,59 @@ class Overworld:
         self.setup_nodes()
         self.setup_icon()
         self.sky = Sky(8, 'overworld')
+        self.preload_level()
+
+        # paths between nodes, drawn again only when a level is unlocked
+        self.paths: pygame.Surface = None
+        # dirty rect drawing, see draw_dirty()
+        self.background: pygame.Surface = None
+        self.full_redraw = True
+        # sprite -> (image, rect) it was last drawn with
+        self.drawn = {}
 
         # time
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = game_time.get_ticks()
         self.allow_input = False
         self.timer_duration = 500
 
+    def reset(self, start_level: int, max_level: int):
+        # the overworld is built once, coming back from a level only updates it
+        if max_level != self.max_level:
+            self.max_level = max_level
+            for index, node in enumerate(self.nodes.sprites()):
+                node.status = 'available' if index <= self.max_level else 'locked'
+            self.paths = None
+            self.background = None
+        self.current_level = start_level
+
+        self.moving = False
+        self.move_direction = pygame.math.Vector2(0, 0)
+        icon: Icon = self.icon.sprite
+        icon.pos = self.nodes.sprites()[self.current_level].rect.center
+        icon.update()
+        self.preload_level()
+
+        self.full_redraw = True
+        self.start_time = game_time.get_ticks()
+        self.allow_input = False
+
+    def preload_level(self):
+        # start loading the level under the icon (or the one it moves to)
+        if self.preloader is not None:
+            self.preloader.prepare(self.current_level)
+
     def setup_nodes(self):
         self.nodes = pygame.sprite.Group()
+        # nodes showing the same graphics share one clock
+        self.clocks = AnimationClocks()
         for index, node_data in enumerate(levels.values()):
+            clock = self.clocks.get(node_data['node_graphics'])
             if index <= self.max_level:
                 node_sprite = Node(
-                    node_data['node_pos'], 'available', self.speed, node_data['node_graphics'])
+                    node_data['node_pos'], 'available', self.speed, node_data['node_graphics'], clock)
             else:
                 node_sprite = Node(
-                    node_data['node_pos'], 'locked', self.speed, node_data['node_graphics'])
+                    node_data['node_pos'], 'locked', self.speed, node_data['node_graphics'], clock)
             self.nodes.add(node_sprite)
 
     def setup_icon(self):
@@ -46,28 +89,37 @@ class Overworld:
                            self.current_level].rect.center)
         self.icon.add(icon_sprite)
 
-    def draw_paths(self):
+    def draw_paths(self, surface: pygame.Surface):
+        if self.paths is None:
+            self.paths = pygame.Surface(
+                self.display_surface.get_size(), flags=pygame.SRCALPHA)
+            self.render_paths(self.paths)
+        surface.blit(self.paths, (0, 0))
+
+    def render_paths(self, surface: pygame.Surface):
         if self.max_level > 0:
             points = [node['node_pos'] for index, node in enumerate(
                 levels.values()) if index <= self.max_level]
-            pygame.draw.lines(self.display_surface,
+            pygame.draw.lines(surface,
                               '#a04f45', False, points, 6)
         points = [node['node_pos'] for index, node in enumerate(
             levels.values()) if index >= self.max_level]
         if len(points) > 0:
-            pygame.draw.lines(self.display_surface, 'black', False, points, 6)
+            pygame.draw.lines(surface, 'black', False, points, 6)
 
     def input(self):
-        keys = pygame.key.get_pressed()
+        keys = inputs.get_pressed()
         if not self.moving and self.allow_input:
             if keys[pygame.K_RIGHT] and self.current_level < self.max_level:
                 self.move_direction = self.get_movement_data(1)
                 self.current_level += 1
                 self.moving = True
+                self.preload_level()
             elif keys[pygame.K_LEFT] and self.current_level > 0:
                 self.move_direction = self.get_movement_data(-1)
                 self.current_level -= 1
                 self.moving = True
+                self.preload_level()
             elif keys[pygame.K_SPACE]:
                 self.create_level(self.current_level)
 
@@ -90,30 +142,103 @@ class Overworld:
 
     def input_timer(self):
         if not self.allow_input:
-            current_time = pygame.time.get_ticks()
+            current_time = game_time.get_ticks()
             if current_time - self.start_time >= self.timer_duration:
                 self.allow_input = True
 
-    def run(self):
+    def update(self):
         self.input_timer()
         self.input()
-        self.sky.draw(self.display_surface)
         self.icon.update()
         self.update_icon_pos()
-        self.draw_paths()
+        self.clocks.tick()
         self.nodes.update()
+
+    def draw(self):
+        self.sky.draw(self.display_surface)
+        self.draw_paths(self.display_surface)
         self.nodes.draw(self.display_surface)
         self.icon.draw(self.display_surface)
 
+    def get_background(self) -> pygame.Surface:
+        # sky and paths never change while on the overworld
+        if self.background is None:
+            self.background = pygame.Surface(
+                self.display_surface.get_size()).convert()
+            self.sky.draw(self.background)
+            self.draw_paths(self.background)
+        return self.background
+
+    def draw_dirty(self) -> List[pygame.Rect]:
+        '''
+        Draws like draw(), but only where a sprite moved or changed its image
+        since the last call. Returns the areas of the screen that changed,
+        for pygame.display.update().
+        Set full_redraw when something else has drawn over the screen.
+        '''
+        background = self.get_background()
+        sprites = self.nodes.sprites() + self.icon.sprites()
+
+        if self.full_redraw:
+            self.full_redraw = False
+            self.display_surface.blit(background, (0, 0))
+            self.nodes.draw(self.display_surface)
+            self.icon.draw(self.display_surface)
+            dirty = [self.display_surface.get_rect()]
+        else:
+            dirty = []
+            for sprite in sprites:
+                last = self.drawn.get(sprite)
+                if last != (sprite.image, sprite.rect):
+                    dirty.append(sprite.rect.copy())
+                    if last is not None and last[1] != sprite.rect:
+                        dirty.append(last[1])
+
+            # restore the background and draw again whatever overlaps it,
+            # clipped so pixels around the area are not blended twice
+            for rect in dirty:
+                self.display_surface.set_clip(rect)
+                self.display_surface.blit(background, rect, rect)
+                for sprite in sprites:
+                    if sprite.rect.colliderect(rect):
+                        self.display_surface.blit(sprite.image, sprite.rect)
+            self.display_surface.set_clip(None)
+
+        self.drawn = {sprite: (sprite.image, sprite.rect.copy())
+                      for sprite in sprites}
+        return dirty
+
+    def run(self):
+        self.update()
+        self.draw()
+
+
+def import_locked_frame(path) -> pygame.Surface:
+    # first frame of a node tinted black, made once and shared
+    path = resource_path(path)
+
+    def tint():
+        surface = import_folder(path)[0].copy()
+        tint_surface = surface.copy()
+        tint_surface.fill('black', None, pygame.BLEND_RGB_MULT)
+        surface.blit(tint_surface, (0, 0))
+        return surface
+
+    return asset_cache.get(('locked', path), tint)
+
 
 class Node(pygame.sprite.Sprite):
-    def __init__(self, pos, status, icon_speed, path) -> None:
+    def __init__(self, pos, status, icon_speed, path, clock: AnimationClock = None, phase: float = 0.0) -> None:
         # icon_speed is used to detect the stop point
         super().__init__()
         self.frames = import_folder(path)
-        self.frame_index = 0
-        self.image = self.frames[self.frame_index]
+        # without a shared clock the node keeps its own
+        self.own_clock = clock is None
+        self.clock = AnimationClock(len(self.frames)) if clock is None else clock
+        self.phase = phase
+        # status can change when the overworld is reset
         self.status = status
+        self.locked_image = import_locked_frame(path)
 
         self.rect = self.image.get_rect(center=pos)
 
@@ -121,20 +246,16 @@ class Node(pygame.sprite.Sprite):
         self.detection_zone = pygame.Rect(
             self.rect.centerx - (icon_speed//2), self.rect.centery - (icon_speed//2), icon_speed, icon_speed)
 
-    def animate(self):
-        self.frame_index += 0.15
-        if self.frame_index >= len(self.frames):
-            self.frame_index = 0
-        self.image = self.frames[int(self.frame_index)]
+    @property
+    def image(self) -> pygame.Surface:
+        if self.status == 'available':
+            return self.frames[self.clock.frame(self.phase)]
+        return self.locked_image
 
     def update(self) -> None:
         super().update()
-        if self.status == 'available':
-            self.animate()
-        else:
-            tint_surface = self.image.copy()
-            tint_surface.fill('black', None, pygame.BLEND_RGB_MULT)
-            self.image.blit(tint_surface, (0, 0))
+        if self.status == 'available' and self.own_clock:
+            self.clock.tick()
 
 
 class Icon(pygame.sprite.Sprite):
@@ -145,8 +266,7 @@ class Icon(pygame.sprite.Sprite):
     def __init__(self, pos) -> None:
         super().__init__()
         self.pos = pos
-        self.image = pygame.image.load(resource_path(
-            'assets/graphics/overworld/hat.png')).convert_alpha()
+        self.image = import_image('assets/graphics/overworld/hat.png')
         self.rect = self.image.get_rect(center=pos)
 
     def update(self):
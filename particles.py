@@ -1,21 +1,27 @@
-from typing import List
+from typing import Dict, List
 import pygame
 from support import import_folder
 
+# frames of every particle type
+PARTICLE_PATHS = {
+    'jump': 'assets/graphics/character/dust_particles/jump',
+    'land': 'assets/graphics/character/dust_particles/land',
+    'explosion': 'assets/graphics/enemy/explosion',
+}
+
 
 class ParticleEffect(pygame.sprite.Sprite):
     def __init__(self, pos, particle_type, groups: List[pygame.sprite.Group]) -> None:
         super().__init__(groups)
-        self.frame_index = 0
         self.animation_speed = 0.5
-        if particle_type == 'jump':
-            self.frames = import_folder(
-                'assets/graphics/character/dust_particles/jump')
-        if particle_type == 'land':
-            self.frames = import_folder(
-                'assets/graphics/character/dust_particles/land')
-        if particle_type == 'explosion':
-            self.frames = import_folder('assets/graphics/enemy/explosion')
+        # set when the effect belongs to a ParticleManager
+        self.manager: 'ParticleManager' = None
+        self.reset(pos, import_folder(PARTICLE_PATHS[particle_type]))
+
+    def reset(self, pos, frames: List[pygame.Surface]):
+        # start the effect over, used when it is taken from the pool
+        self.frames = frames
+        self.frame_index = 0
         self.image = self.frames[self.frame_index]
         self.rect = self.image.get_rect(center=pos)
 
@@ -29,6 +35,54 @@ class ParticleEffect(pygame.sprite.Sprite):
     def run(self):
         self.animate()
 
+    def kill(self):
+        super().kill()
+        if self.manager is not None:
+            self.manager.release(self)
+
+
+class ParticleManager:
+    '''
+    Loads the frames of every particle type when the level starts and
+    recycles a fixed pool of ParticleEffect sprites, so emitting a particle
+    during gameplay neither reads files nor creates new objects.
+    When every effect is in use the oldest one is restarted.
+    Effects left outside the activity region are released right away,
+    as they would sleep there and never reach their last frame.
+    '''
+
+    def __init__(self, groups: List[pygame.sprite.Group], pool_size: int = 64) -> None:
+        self.groups = groups
+        self.frames: Dict[str, List[pygame.Surface]] = {
+            particle_type: import_folder(path) for particle_type, path in PARTICLE_PATHS.items()}
+        self.free: List[ParticleEffect] = []
+        # effects on screen, oldest first
+        self.active: Dict[ParticleEffect, None] = {}
+        for _ in range(pool_size):
+            effect = ParticleEffect((0, 0), 'jump', [])
+            effect.manager = self
+            self.free.append(effect)
+
+    def emit(self, pos, particle_type: str) -> ParticleEffect:
+        if not self.free:
+            next(iter(self.active)).kill()
+        effect = self.free.pop()
+        effect.reset(pos, self.frames[particle_type])
+        effect.add(self.groups)
+        self.active[effect] = None
+        return effect
+
+    def release_outside(self, region: pygame.Rect):
+        # effects are short lived, one far from the view is not seen finishing
+        for effect in [effect for effect in self.active
+                       if not region.colliderect(effect.rect)]:
+            effect.kill()
+
+    def release(self, effect: ParticleEffect):
+        if effect in self.active:
+            del self.active[effect]
+            self.free.append(effect)
+
 
 if __name__ == '__main__':
     from main import main
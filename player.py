@@ -1,7 +1,10 @@
 from typing import Callable, List
 import pygame
-from particles import ParticleEffect
-from support import import_folder, resource_path
+import game_time
+import inputs
+from particles import ParticleManager
+from spatial import CollisionMap, SpatialGroup
+from support import import_folder, import_mirrored_folder, resource_path
 from math import sin
 
 
@@ -11,8 +14,9 @@ class Player(pygame.sprite.Sprite):
                  surface: pygame.Surface,
                  change_health: Callable,
                  groups: List[pygame.sprite.Group],
-                 collisions_sprites: pygame.sprite.Group,
-                 enemies_sprites: pygame.sprite.Group
+                 collision_map: CollisionMap,
+                 enemies_sprites: SpatialGroup,
+                 particles: ParticleManager = None
                  ) -> None:
         super().__init__(groups)
         self.import_character_assets()
@@ -30,8 +34,12 @@ class Player(pygame.sprite.Sprite):
         # separate sword pixels from collision rectangle
         self.collision_rect = pygame.Rect(
             self.rect.topleft, (50, self.rect.height))
-        self.collisions_sprites = collisions_sprites
+        self.collision_map = collision_map
         self.enemies_sprites = enemies_sprites
+        # jump, landing and stomp effects
+        if particles is None:
+            particles = ParticleManager(self.groups())
+        self.particles = particles
 
         # player status
         self.status = 'idle'
@@ -48,6 +56,7 @@ class Player(pygame.sprite.Sprite):
         self.import_dust_run_particles()
         self.dust_frame_index = 0
         self.dust_animation_speed = 0.15
+        self.show_dust = False
 
         # audio
         self.jump_sound = pygame.mixer.Sound(
@@ -62,14 +71,18 @@ class Player(pygame.sprite.Sprite):
         character_path = 'assets/graphics/character/'
         self.animations: dict[str, List[pygame.Surface]] = {
             'idle': [], 'run': [], 'jump': [], 'fall': []}
+        # same animations facing left
+        self.animations_left: dict[str, List[pygame.Surface]] = {}
 
         for animation in self.animations.keys():
             full_path = character_path + animation
             self.animations[animation] = import_folder(full_path)
+            self.animations_left[animation] = import_mirrored_folder(full_path)
 
     def import_dust_run_particles(self):
-        self.dust_run_particles = import_folder(
-            'assets/graphics/character/dust_particles/run')
+        path = 'assets/graphics/character/dust_particles/run'
+        self.dust_run_particles = import_folder(path)
+        self.dust_run_particles_left = import_mirrored_folder(path)
 
     def animate(self):
         animation = self.animations[self.status]
@@ -79,13 +92,12 @@ class Player(pygame.sprite.Sprite):
         if self.frame_index > len(animation):
             self.frame_index = 0
 
-        image = animation[int(self.frame_index)]
         if self.facing_right:
-            self.image = image
+            self.image = animation[int(self.frame_index)]
             self.rect.bottomleft = self.collision_rect.bottomleft
         else:
-            flipped_image = pygame.transform.flip(image, True, False)
-            self.image = flipped_image
+            self.image = self.animations_left[self.status][int(
+                self.frame_index)]
             self.rect.bottomright = self.collision_rect.bottomright
 
         if self.invincible:
@@ -97,44 +109,47 @@ class Player(pygame.sprite.Sprite):
         self.rect = self.image.get_rect(midbottom=(self.rect.midbottom))
 
     def run_dust_animation(self):
-        if self.status == 'run' and self.on_floor:
+        self.show_dust = self.status == 'run' and self.on_floor
+        if self.show_dust:
             self.dust_frame_index += self.dust_animation_speed
             if self.dust_frame_index >= len(self.dust_run_particles):
                 self.dust_frame_index = 0
 
-            dust_particle = self.dust_run_particles[int(self.dust_frame_index)]
+    def draw_dust(self):
+        # drawing is kept out of run() so it happens once per rendered frame
+        if self.show_dust:
+            frame = int(self.dust_frame_index)
 
             if self.facing_right:
                 pos = self.rect.bottomleft - pygame.math.Vector2(6, 10)
-                self.display_surface.blit(dust_particle, pos)
+                self.display_surface.blit(self.dust_run_particles[frame], pos)
             else:
                 pos = self.rect.bottomright - pygame.math.Vector2(6, 10)
-                flipped_dust_particle = pygame.transform.flip(
-                    dust_particle, True, False)
-                self.display_surface.blit(flipped_dust_particle, pos)
+                self.display_surface.blit(
+                    self.dust_run_particles_left[frame], pos)
 
     def get_damage(self):
         if not self.invincible:
             self.change_health(-10)
             self.invincible = True
-            self.hurt_time = pygame.time.get_ticks()
+            self.hurt_time = game_time.get_ticks()
             self.hit_sound.play()
 
     def invincibility_timer(self):
         if self.invincible:
-            current_time = pygame.time.get_ticks()
+            current_time = game_time.get_ticks()
             if current_time - self.hurt_time >= self.invincibility_duration:
                 self.invincible = False
 
     def wave_value(self):
-        value = sin(pygame.time.get_ticks())
+        value = sin(game_time.get_ticks())
         if value >= 0:
             return 255
         else:
             return 0
 
     def get_input(self):
-        keys = pygame.key.get_pressed()
+        keys = inputs.get_pressed()
 
         if keys[pygame.K_RIGHT]:
             self.direction.x = 1
@@ -163,40 +178,38 @@ class Player(pygame.sprite.Sprite):
             pos -= pygame.math.Vector2(15, 5)
         else:
             pos += pygame.math.Vector2(5, 5)
-        ParticleEffect(pos, 'jump', self.groups())
+        self.particles.emit(pos, 'jump')
 
     def check_enemy_collisions(self):
-        for enemy in self.enemies_sprites.sprites():
-            if enemy.rect.colliderect(self.collision_rect):
-                if self.direction.y > 0:
-                    self.stomp_sound.play()
-                    self.direction.y = -20
-                    ParticleEffect(
-                        enemy.rect.center, 'explosion', self.groups())
-                    enemy.kill()
-                else:
-                    self.get_damage()
+        for enemy in self.enemies_sprites.collide(self.collision_rect):
+            if self.direction.y > 0:
+                self.stomp_sound.play()
+                self.direction.y = -20
+                self.particles.emit(enemy.rect.center, 'explosion')
+                enemy.kill()
+            else:
+                self.get_damage()
 
     def horizontal_collisions(self):
         self.collision_rect.x += self.direction.x * self.speed
-        for sprite in self.collisions_sprites.sprites():
-            if sprite.rect.colliderect(self.collision_rect):
+        for rect in self.collision_map.collide(self.collision_rect):
+            if rect.colliderect(self.collision_rect):
                 if self.direction.x < 0:
-                    self.collision_rect.left = sprite.rect.right
+                    self.collision_rect.left = rect.right
                 if self.direction.x > 0:
-                    self.collision_rect.right = sprite.rect.left
+                    self.collision_rect.right = rect.left
 
     def vertical_collisions(self):
-        for sprite in self.collisions_sprites.sprites():
-            if sprite.rect.colliderect(self.collision_rect):
+        for rect in self.collision_map.collide(self.collision_rect):
+            if rect.colliderect(self.collision_rect):
                 if self.direction.y > 0:
-                    self.collision_rect.bottom = sprite.rect.top
+                    self.collision_rect.bottom = rect.top
                     self.direction.y = 0
                     # create dust particles before set on_floor
                     self.create_landing_dust()
                     self.on_floor = True
                 if self.direction.y < 0:
-                    self.collision_rect.top = sprite.rect.bottom
+                    self.collision_rect.top = rect.bottom
                     self.direction.y = 0
         if self.on_floor and self.direction.y != 0:
             self.on_floor = False
@@ -208,8 +221,7 @@ class Player(pygame.sprite.Sprite):
                 offset = pygame.math.Vector2(10, 15)
             else:
                 offset = pygame.math.Vector2(-10, 15)
-            ParticleEffect(self.rect.midbottom -
-                           offset, 'land', self.groups())
+            self.particles.emit(self.rect.midbottom - offset, 'land')
 
     def run(self):
         self.get_input()
@@ -0,0 +1,107 @@
+from collections import deque
+from time import perf_counter_ns
+from typing import Deque, Dict
+import pygame
+from ui import get_font
+
+# graph colours, phases not listed here get the last one
+PHASE_COLORS = {
+    'input': '#f2d16b',
+    'sky': '#7ec8e3',
+    'coins': '#f0a500',
+    'run Player': '#e05a47',
+    'enemies': '#b35de0',
+    'run ParticleEffect': '#8fd694',
+    'camera': '#4a90e2',
+    'ui': '#dddddd',
+    'display': '#ff7eb6',
+    'other': '#999999',
+}
+
+
+class FrameProfiler:
+    '''
+    Times the phases of each frame with perf_counter_ns and draws a rolling graph.
+    While disabled, start() and stop() return right away so
+    the instrumented code pays only for two calls.
+    '''
+
+    def __init__(self, history: int = 180) -> None:
+        self.enabled = False
+        self.history = history
+        # nanoseconds spent in each phase during the current frame
+        self.current: Dict[str, int] = {}
+        # milliseconds per phase for the last frames
+        self.samples: Dict[str, Deque[float]] = {}
+        self.font = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.current.clear()
+        self.samples.clear()
+
+    def start(self) -> int:
+        return perf_counter_ns() if self.enabled else 0
+
+    def stop(self, phase: str, start: int):
+        if self.enabled:
+            self.current[phase] = self.current.get(
+                phase, 0) + perf_counter_ns() - start
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        for phase in self.current.keys() | self.samples.keys():
+            if phase not in self.samples:
+                self.samples[phase] = deque(
+                    [0.0] * self.history, maxlen=self.history)
+            self.samples[phase].append(self.current.get(phase, 0) / 1e6)
+        self.current.clear()
+
+    def draw(self, surface: pygame.Surface):
+        if not self.enabled or not self.samples:
+            return
+        if self.font is None:
+            self.font = get_font(None, 18)
+
+        line_height = 16
+        graph_height = 100
+        # the top of the graph is 20 ms
+        scale = graph_height / 20
+        width = max(self.history, 260)
+        height = graph_height + 12 + line_height * len(self.samples)
+        panel_rect = pygame.Rect(
+            surface.get_width() - width - 10, 10, width, height)
+
+        panel = pygame.Surface(panel_rect.size, flags=pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        # 60 FPS frame budget
+        budget_y = graph_height - int(1000 / 60 * scale)
+        if budget_y >= 0:
+            pygame.draw.line(panel, '#555555', (0, budget_y),
+                             (self.history, budget_y))
+
+        phases = sorted(self.samples, key=lambda phase: -
+                        sum(self.samples[phase]))
+        for index, phase in enumerate(phases):
+            color = PHASE_COLORS.get(phase, PHASE_COLORS['other'])
+            samples = self.samples[phase]
+            points = [(x, max(graph_height - int(value * scale), 0))
+                      for x, value in enumerate(samples)]
+            pygame.draw.lines(panel, color, False, points)
+
+            average = sum(samples) / len(samples)
+            label = f'{phase}: {average:.2f} ms (max {max(samples):.2f})'
+            text = self.font.render(label, True, color)
+            panel.blit(text, (6, graph_height + 6 + index * line_height))
+
+        surface.blit(panel, panel_rect)
+
+
+# shared by every module, toggled in game with F3
+profiler = FrameProfiler()
+
+
+if __name__ == '__main__':
+    from main import main
+    main()
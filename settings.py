@@ -17,6 +17,25 @@ TILE_SIZE = 64
 SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = TILE_SIZE * VERTICAL_TILE_NUMBER
 
+# timing
+# the game logic always advances at SIMULATION_HZ steps per second,
+# rendering is capped at MAX_FPS (0 means uncapped)
+SIMULATION_HZ = 60
+MAX_FPS = 60
+# steps allowed per rendered frame before the simulation is slowed down
+MAX_STEPS_PER_FRAME = 5
+
+# redraw and update only the changed parts of the overworld screen
+OVERWORLD_DIRTY_RECTS = True
+
+# levels at least this many columns wide are streamed:
+# only the columns around the camera exist as sprites
+STREAMING_MIN_COLUMNS = 500
+
+# enemies and effects further than this from the view sleep:
+# they are not updated until they come back in range
+ACTIVITY_MARGIN = 600
+
 # camera
 CAMERA_BORDERS = {
     'left': SCREEN_WIDTH//4,
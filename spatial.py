@@ -0,0 +1,137 @@
+from typing import Dict, List, Tuple
+import pygame
+from settings import TILE_SIZE
+
+
+class SpatialGroup(pygame.sprite.Group):
+    '''
+    Sprite group that also buckets its sprites in a uniform grid (spatial hash),
+    so collision queries only look at sprites in the cells around a rect
+    instead of scanning the whole group.
+    Sprites that move must call refresh() (or moved()) after changing their rect.
+    '''
+
+    def __init__(self, *sprites, cell_size: int = TILE_SIZE) -> None:
+        self.cell_size = cell_size
+        # cell -> sprites in that cell, dicts keep insertion order for determinism
+        self.cells: Dict[Tuple[int, int], Dict[pygame.sprite.Sprite, None]] = {}
+        # sprite -> (left, top, right, bottom) cell bounds it is registered in
+        self.sprite_bounds: Dict[pygame.sprite.Sprite, Tuple[int, int, int, int]] = {}
+        super().__init__(*sprites)
+
+    def cell_bounds(self, rect: pygame.Rect) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, sprite, bounds):
+        left, top, right, bottom = bounds
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                self.cells.setdefault((x, y), {})[sprite] = None
+        self.sprite_bounds[sprite] = bounds
+
+    def discard(self, sprite):
+        bounds = self.sprite_bounds.pop(sprite, None)
+        if bounds is None:
+            return
+        left, top, right, bottom = bounds
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = self.cells.get((x, y))
+                if cell is not None:
+                    cell.pop(sprite, None)
+                    if not cell:
+                        del self.cells[(x, y)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.insert(sprite, self.cell_bounds(sprite.rect))
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+        self.discard(sprite)
+
+    def refresh(self, sprite):
+        # only touch the grid when the sprite crossed into other cells
+        bounds = self.cell_bounds(sprite.rect)
+        if self.sprite_bounds.get(sprite) != bounds:
+            self.discard(sprite)
+            self.insert(sprite, bounds)
+
+    def query(self, rect: pygame.Rect) -> List[pygame.sprite.Sprite]:
+        # candidates sharing a cell with rect, no exact collision test
+        left, top, right, bottom = self.cell_bounds(rect)
+        candidates: Dict[pygame.sprite.Sprite, None] = {}
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    candidates.update(cell)
+        return list(candidates)
+
+    def collide(self, rect: pygame.Rect, dokill: bool = False) -> List[pygame.sprite.Sprite]:
+        collided = [sprite for sprite in self.query(rect)
+                    if sprite.rect.colliderect(rect)]
+        if dokill:
+            for sprite in collided:
+                sprite.kill()
+        return collided
+
+
+class CollisionMap:
+    '''
+    Solid terrain stored as one byte per grid cell, plus a SpatialGroup for
+    solids that do not sit on the grid (crates, foreground palms).
+    Collision queries only visit the cells a rect overlaps.
+    '''
+
+    def __init__(self, columns: int, rows: int, cell_size: int = TILE_SIZE) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.cell_size = cell_size
+        self.solid = bytearray(columns * rows)
+        self.sprites = SpatialGroup(cell_size=cell_size)
+
+    def set_solid(self, column: int, row: int):
+        self.solid[row * self.columns + column] = 1
+
+    def is_solid(self, column: int, row: int) -> bool:
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.solid[row * self.columns + column] == 1
+        return False
+
+    def add(self, sprite: pygame.sprite.Sprite):
+        self.sprites.add(sprite)
+
+    def collide(self, rect: pygame.Rect) -> List[pygame.Rect]:
+        # rects of every solid overlapping rect, terrain first in row order
+        size = self.cell_size
+        left = max(rect.left // size, 0)
+        right = min((rect.right - 1) // size, self.columns - 1)
+        top = max(rect.top // size, 0)
+        bottom = min((rect.bottom - 1) // size, self.rows - 1)
+
+        rects = []
+        for row in range(top, bottom + 1):
+            offset = row * self.columns
+            for column in range(left, right + 1):
+                if self.solid[offset + column]:
+                    rects.append(pygame.Rect(
+                        column * size, row * size, size, size))
+        rects.extend(sprite.rect for sprite in self.sprites.collide(rect))
+        return rects
+
+
+def moved(sprite: pygame.sprite.Sprite):
+    # keep every group that indexes a moving sprite by position up to date:
+    # spatial groups and the column buckets of the camera
+    for group in sprite.groups():
+        refresh = getattr(group, 'refresh', None)
+        if refresh is not None:
+            refresh(sprite)
+
+
+if __name__ == '__main__':
+    from main import main
+    main()
@@ -0,0 +1,149 @@
+from random import Random
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+import pygame
+from enemy import Enemy
+from level_loader import LayerData
+from settings import SCREEN_WIDTH, TILE_SIZE
+
+if TYPE_CHECKING:
+    from level import Level
+
+# layers spawned with their columns, back to front
+STREAMED_LAYERS = ('bg_palms', 'terrain', 'grass', 'crates',
+                   'coins', 'fg_palms', 'enemies')
+# sprites of these layers do not come back once collected,
+# enemies are kept track of on their own
+REMEMBERED_LAYERS = ('coins',)
+
+
+class LevelStreamer:
+    '''
+    Keeps sprites only for the columns around the camera, in bands as wide as
+    a StaticLayer chunk. Bands coming into view are spawned from the layer
+    data and bands left far behind are retired, so the sprites in memory do
+    not depend on the level width. Collected coins and killed enemies are
+    remembered and not spawned again.
+    Enemies walk from band to band, so they belong to the band they are in:
+    they are parked with their position, speed and frame when it is retired
+    and come back as they were when it is spawned again.
+    '''
+
+    def __init__(self, level: 'Level', layers: Dict[str, LayerData], margin: int = 1) -> None:
+        self.level = level
+        self.band_width = level.static_layer.chunk_width
+        # bands kept on each side of the view
+        self.margin = margin
+
+        # band -> (layer, row, column, id) of its cells, back to front
+        self.cells: Dict[int, List[Tuple[str, int, int, int]]] = {}
+        for layer in STREAMED_LAYERS:
+            for row_index, column_index, cell in layers[layer].cells:
+                band = column_index * TILE_SIZE // self.band_width
+                self.cells.setdefault(band, []).append(
+                    (layer, row_index, column_index, cell))
+
+        # the water goes on past both ends of the level
+        level_width = layers['terrain'].columns * TILE_SIZE
+        self.first_band = level.water.start // self.band_width
+        self.last_band = (level_width + SCREEN_WIDTH - 1) // self.band_width
+
+        # band -> sprites spawned for it with their (layer, row, column)
+        self.spawned: Dict[int, List[Tuple[Optional[Tuple[str, int, int]], pygame.sprite.Sprite]]] = {}
+        # (layer, row, column) of collected coins and killed enemies
+        self.gone: Set[Tuple[str, int, int]] = set()
+        # (layer, row, column) -> enemy spawned from that cell and its tile id
+        self.enemies: Dict[Tuple[str, int, int], Tuple[Enemy, int]] = {}
+        # band -> enemies retired in it: (layer, row, column) -> (x, speed, frame index, tile id)
+        self.parked: Dict[int, Dict[Tuple[str, int, int], Tuple[int, int, float, int]]] = {}
+        # (layer, row, column) -> band a parked enemy waits in
+        self.parked_at: Dict[Tuple[str, int, int], int] = {}
+
+    def update(self, view_rect: pygame.Rect):
+        first = max(view_rect.left // self.band_width -
+                    self.margin, self.first_band)
+        last = min((view_rect.right - 1) // self.band_width +
+                   self.margin, self.last_band)
+        for band in range(first, last + 1):
+            if band not in self.spawned:
+                self.spawn(band)
+        # one more band is kept, so moving back and forth does not respawn it
+        for band in list(self.spawned):
+            if band < first - 1 or band > last + 1:
+                self.retire(band)
+
+    def spawn(self, band: int):
+        level = self.level
+        left = band * self.band_width
+        sprites = []
+        enemies = []
+        level.set_draw_layer('water')
+        for sprite in level.water.spawn_between(left, left + self.band_width):
+            sprites.append((None, sprite))
+
+        for layer, row_index, column_index, cell in self.cells.get(band, ()):
+            key = (layer, row_index, column_index)
+            if key in self.gone or key in self.enemies or key in self.parked_at:
+                continue
+            level.set_draw_layer(layer)
+            if layer == 'enemies':
+                enemies.append(self.spawn_enemy(key, cell))
+                continue
+            sprite = level.create_tile(layer, row_index, column_index, cell)
+            if sprite is not None:
+                sprites.append((key, sprite))
+
+        level.set_draw_layer('enemies')
+        for key, (x, speed, frame_index, cell) in self.parked.pop(band, {}).items():
+            del self.parked_at[key]
+            enemy = self.spawn_enemy(key, cell)
+            level.enemy_system.place(enemy.index, x, speed, frame_index)
+            enemies.append(enemy)
+        level.set_draw_layer('particles')
+
+        # enemies are bucketed where they were placed and move buckets when synced
+        for _, sprite in sprites:
+            level.visible_sprites.index(sprite)
+        for enemy in enemies:
+            level.visible_sprites.index(enemy)
+        # terrain and grass go in the band's chunk, made by the first tile added
+        chunk = level.static_layer.chunks.get(band)
+        if chunk is not None and chunk in level.visible_sprites.dynamic_sprites:
+            level.visible_sprites.index(chunk)
+        self.spawned[band] = sprites
+
+    def spawn_enemy(self, key: Tuple[str, int, int], cell: int) -> Enemy:
+        _, row_index, column_index = key
+        # an enemy gets the same speed whenever its cell is spawned
+        rng = Random(f'{self.level.seed}:{row_index}:{column_index}')
+        enemy = self.level.create_tile(
+            'enemies', row_index, column_index, cell, rng=rng)
+        self.enemies[key] = (enemy, cell)
+        return enemy
+
+    def retire(self, band: int):
+        for key, sprite in self.spawned.pop(band):
+            if key is not None and key[0] in REMEMBERED_LAYERS and not sprite.alive():
+                self.gone.add(key)
+            sprite.kill()
+        self.level.static_layer.remove_chunk(band)
+
+        # enemies outside the spawned bands are parked where they stand
+        system = self.level.enemy_system
+        for key, (enemy, cell) in list(self.enemies.items()):
+            if not enemy.alive():
+                self.gone.add(key)
+                del self.enemies[key]
+                continue
+            x = system.x[enemy.index]
+            enemy_band = x // self.band_width
+            if enemy_band not in self.spawned:
+                self.parked.setdefault(enemy_band, {})[key] = (
+                    x, system.speed[enemy.index], system.frame_index[enemy.index], cell)
+                self.parked_at[key] = enemy_band
+                del self.enemies[key]
+                enemy.kill()
+
+
+if __name__ == '__main__':
+    from main import main
+    main()
@@ -1,8 +1,11 @@
-from os import walk
-from os.path import join
+from collections import OrderedDict
+import json
+from os import stat, walk
+from os.path import join, normpath, relpath
 import sys
-from typing import List
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
 from csv import reader
+import zlib
 
 from settings import TILE_SIZE
 
@@ -15,18 +18,153 @@ def resource_path(relative):
     return join(relative)
 
 
+class AssetCache:
+    '''
+    Keeps converted surfaces in memory so each image is decoded only once.
+    The least recently used entries are dropped when max_entries is reached.
+    Cached surfaces are shared, callers must copy them before drawing on them.
+    '''
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, loader: Callable):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        value = loader()
+        self.entries[key] = value
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+asset_cache = AssetCache()
+
+
+# written by atlas.py
+ATLAS_MANIFEST = 'assets/atlas/manifest.json'
+ATLAS_VERSION = 1
+
+
+def atlas_key(path) -> str:
+    # images are listed in the manifest relative to the game folder
+    if hasattr(sys, "_MEIPASS"):
+        path = relpath(path, sys._MEIPASS)
+    return normpath(path).replace('\\', '/')
+
+
+def file_stamp(path) -> int:
+    # changes whenever the file is edited or replaced
+    info = stat(path)
+    return zlib.crc32(repr((info.st_size, info.st_mtime_ns)).encode())
+
+
+class TextureAtlas:
+    '''
+    Images packed into a few large pages by atlas.py.
+    get() hands out subsurface views of a page instead of loading each file,
+    or None when the image is not in the atlas or changed after it was built.
+    '''
+
+    def __init__(self, manifest_path: str = ATLAS_MANIFEST) -> None:
+        self.manifest_path = manifest_path
+        # image -> (page index, rect in the page, file stamp), read on first use
+        self.images: Dict[str, Tuple[int, Tuple[int, int, int, int], int]] = None
+        self.page_files: List[str] = []
+        self.pages: Dict[int, pygame.Surface] = {}
+
+    def load_manifest(self):
+        self.images = {}
+        try:
+            with open(resource_path(self.manifest_path)) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return
+        if manifest.get('version') != ATLAS_VERSION:
+            return
+        self.page_files = manifest['pages']
+        for path, entry in manifest['images'].items():
+            self.images[path] = (entry['page'], tuple(
+                entry['rect']), entry['stamp'])
+
+    def get_page(self, index: int) -> Optional[pygame.Surface]:
+        if index not in self.pages:
+            try:
+                page = pygame.image.load(
+                    resource_path(self.page_files[index]))
+            except (OSError, pygame.error):
+                return None
+            self.pages[index] = page.convert_alpha()
+        return self.pages[index]
+
+    def get(self, path) -> Optional[pygame.Surface]:
+        if self.images is None:
+            self.load_manifest()
+        entry = self.images.get(atlas_key(path))
+        if entry is None:
+            return None
+        index, rect, stamp = entry
+        try:
+            if file_stamp(path) != stamp:
+                return None
+        except OSError:
+            return None
+        page = self.get_page(index)
+        return None if page is None else page.subsurface(rect)
+
+
+texture_atlas = TextureAtlas()
+
+
+def load_image(path, alpha=True) -> pygame.Surface:
+    # images drawn with alpha come from the atlas when it is up to date
+    if alpha:
+        surface = texture_atlas.get(resource_path(path))
+        if surface is not None:
+            return surface
+    surface = pygame.image.load(resource_path(path))
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+def import_image(path, alpha=True) -> pygame.Surface:
+    path = resource_path(path)
+    return asset_cache.get(('image', path, alpha), lambda: load_image(path, alpha))
+
+
 def import_folder(path) -> List[pygame.Surface]:
     path = resource_path(path)
-    surface_list = []
 
-    for _, __, img_files in walk(path):
-        for image in img_files:
-            full_path = join(path, image)
-            image_surface = pygame.image.load(
-                resource_path(full_path)).convert_alpha()
-            surface_list.append(image_surface)
+    def load():
+        surface_list = []
+        for _, __, img_files in walk(path):
+            for image in img_files:
+                full_path = join(path, image)
+                surface_list.append(load_image(full_path))
+        return surface_list
+
+    return asset_cache.get(('folder', path), load)
 
-    return surface_list
+
+def import_mirrored_folder(path) -> List[pygame.Surface]:
+    # frames of import_folder facing the other way, flipped once and shared
+    path = resource_path(path)
+    return asset_cache.get(('mirrored', path), lambda: [
+        pygame.transform.flip(surface, True, False) for surface in import_folder(path)])
 
 
 def import_csv_layout(path):
@@ -41,23 +179,24 @@ def import_csv_layout(path):
 
 def import_cut_graphics(path):
     path = resource_path(path)
-    surface = pygame.image.load(resource_path(path)).convert_alpha()
-    tile_num_x = surface.get_width()//TILE_SIZE
-    tile_num_y = surface.get_height()//TILE_SIZE
-
-    cut_tiles = []
-
-    for row in range(tile_num_y):
-        for col in range(tile_num_x):
-            x = col * TILE_SIZE
-            y = row * TILE_SIZE
-            new_surface = pygame.Surface(
-                (TILE_SIZE, TILE_SIZE), flags=pygame.SRCALPHA)
-            new_surface.blit(surface, (0, 0), pygame.Rect(
-                x, y, TILE_SIZE, TILE_SIZE))
-            cut_tiles.append(new_surface)
-
-    return cut_tiles
+
+    def load():
+        surface = import_image(path)
+        tile_num_x = surface.get_width()//TILE_SIZE
+        tile_num_y = surface.get_height()//TILE_SIZE
+
+        cut_tiles = []
+
+        # views into the sheet, no pixels are copied
+        for row in range(tile_num_y):
+            for col in range(tile_num_x):
+                x = col * TILE_SIZE
+                y = row * TILE_SIZE
+                cut_tiles.append(surface.subsurface(
+                    pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)))
+        return cut_tiles
+
+    return asset_cache.get(('cut', path), load)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+from os.path import abspath, dirname, exists
+import pytest
+
+# sets up SDL's dummy drivers before pygame starts
+from headless import init_headless, replay_source, run_level
+import pygame
+import game_time
+import inputs
+from main import Game
+
+ROOT = dirname(abspath(__file__))
+
+
+@pytest.fixture(autouse=True)
+def headless_game(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    init_headless()
+    # the music is not in every checkout and has no effect on the simulation
+    sound = pygame.mixer.Sound
+    monkeypatch.setattr(pygame.mixer, 'Sound', lambda path: sound(
+        path if exists(path) else 'assets/audio/effects/coin.wav'))
+    yield
+    inputs.set_source(inputs.KeyboardInput())
+    game_time.use_real_time()
+
+
+def play_session(path: str, frames: int) -> list:
+    # plays a game from the overworld and returns (level, frames, coins, health) of every level finished
+    script = inputs.parse_script('right:0-5000,' + ','.join(
+        f'space:{frame}-{frame + 2}' for frame in range(40, frames, 97)))
+    source = inputs.RecordingInput(inputs.ScriptedInput(script), 1234)
+    inputs.set_source(source)
+    game_time.use_simulated_time()
+    game = Game(1234)
+
+    # levels report to Game through these, note what each level changed
+    coins = []
+    health_changes = []
+
+    def change_coins(amount: int):
+        coins.append(amount)
+        Game.change_coins(game, amount)
+
+    def change_health(amount: int):
+        health_changes.append(amount)
+        Game.change_health(game, amount)
+
+    game.change_coins = change_coins
+    game.change_health = change_health
+
+    finished = []
+    level_frames = 0
+    for _ in range(frames):
+        if game.status == 'level' and level_frames == 0:
+            coins.clear()
+            health_changes.clear()
+            start_health = game.cur_health
+            level_number = game.level.current_level
+        was_level = game.status == 'level'
+        game.update()
+        if was_level:
+            level_frames += 1
+            if game.status == 'overworld' or game.level.current_level != level_number:
+                finished.append((level_number, level_frames, sum(coins),
+                                 start_health + sum(health_changes)))
+                level_frames = 0
+    game.preloader.shutdown()
+    source.save(path)
+    return finished
+
+
+def test_levels_of_a_game_replay_headless(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    finished = play_session(path, 3000)
+    assert len(finished) >= 2
+
+    replays = []
+    for index, (level_number, frames, _, _) in enumerate(finished):
+        source, segment = replay_source(
+            path, level_number, sum(1 for other in finished[:index] if other[0] == level_number))
+        assert segment.ticks > 0
+        result = run_level(level_number, frames, source, segment.seed,
+                           segment.health, segment.ticks)
+        replays.append((level_number, result['frames'],
+                       result['coins'], result['health']))
+    assert replays == finished
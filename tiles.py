@@ -1,6 +1,8 @@
-from typing import List
+from collections import OrderedDict
+from typing import Dict, List
 import pygame
-from support import resource_path, import_folder
+from settings import TILE_SIZE, SCREEN_WIDTH
+from support import import_folder, import_image
 
 
 class Tile(pygame.sprite.Sprite):
@@ -19,20 +21,78 @@ class StaticTile(Tile):
 
 class Crate(StaticTile):
     def __init__(self, pos, size, groups: List[pygame.sprite.Group]) -> None:
-        super().__init__(pos, size, pygame.image.load(resource_path(
-            'assets/graphics/terrain/crate.png')).convert_alpha(), groups)
+        super().__init__(pos, size, import_image(
+            'assets/graphics/terrain/crate.png'), groups)
         offset_y = pos[1] + size
         self.rect = self.image.get_rect(bottomleft=(pos[0], offset_y))
 
 
+class AnimationClock:
+    '''
+    Frame counter shared by every sprite playing the same animation,
+    so an animation advances once per frame however many sprites show it.
+    '''
+
+    def __init__(self, frame_count: int, speed: float = 0.15) -> None:
+        self.frame_count = frame_count
+        self.speed = speed
+        self.frame_index = 0.0
+
+    def tick(self):
+        self.frame_index += self.speed
+        if self.frame_index >= self.frame_count:
+            self.frame_index = 0.0
+
+    def frame(self, phase: float = 0.0) -> int:
+        # phase shifts one sprite ahead of the others, in frames
+        return int((self.frame_index + phase) % self.frame_count)
+
+
+class AnimationClocks:
+    '''
+    One AnimationClock per animation folder, ticked together once per frame.
+    '''
+
+    def __init__(self, speed: float = 0.15) -> None:
+        self.speed = speed
+        self.clocks: Dict[str, AnimationClock] = {}
+
+    def get(self, path: str) -> AnimationClock:
+        clock = self.clocks.get(path)
+        if clock is None:
+            clock = AnimationClock(len(import_folder(path)), self.speed)
+            self.clocks[path] = clock
+        return clock
+
+    def tick(self):
+        for clock in self.clocks.values():
+            clock.tick()
+
+
 class AnimatedTile(Tile):
-    def __init__(self, pos, size, path, groups: List[pygame.sprite.Group]) -> None:
+    def __init__(self, pos, size, path, groups: List[pygame.sprite.Group], clock: AnimationClock = None, phase: float = 0.0) -> None:
+        self.clock = None
         super().__init__(pos, size, groups)
         self.frames = import_folder(path)
         self.frame_index = 0
         self.image = self.frames[self.frame_index]
+        # with a clock the frame is read from it, animate() is not needed
+        self.clock = clock
+        self.phase = phase
+
+    @property
+    def image(self) -> pygame.Surface:
+        if self.clock is not None:
+            return self.frames[self.clock.frame(self.phase)]
+        return self.own_image
+
+    @image.setter
+    def image(self, surface: pygame.Surface):
+        self.own_image = surface
 
     def animate(self):
+        if self.clock is not None:
+            return
         self.frame_index += 0.15
         if self.frame_index >= len(self.frames):
             self.frame_index = 0
@@ -43,8 +103,8 @@ class AnimatedTile(Tile):
 
 
 class Coin(AnimatedTile):
-    def __init__(self, pos, size, path, value, groups: List[pygame.sprite.Group]) -> None:
-        super().__init__(pos, size, path, groups)
+    def __init__(self, pos, size, path, value, groups: List[pygame.sprite.Group], clock: AnimationClock = None) -> None:
+        super().__init__(pos, size, path, groups, clock)
         cx = pos[0] + size // 2
         cy = pos[1] + size // 2
         self.rect = self.image.get_rect(center=(cx, cy))
@@ -52,12 +112,88 @@ class Coin(AnimatedTile):
 
 
 class Palm(AnimatedTile):
-    def __init__(self, pos, size, path, offset, groups: List[pygame.sprite.Group]) -> None:
-        super().__init__(pos, size, path, groups)
+    def __init__(self, pos, size, path, offset, groups: List[pygame.sprite.Group], clock: AnimationClock = None) -> None:
+        super().__init__(pos, size, path, groups, clock)
         offset_y = pos[1] - offset
         self.rect.topleft = (pos[0], offset_y)
 
 
+class StaticChunk(pygame.sprite.Sprite):
+    '''
+    A strip of static tiles (terrain, grass) drawn as one surface.
+    The surface is rendered when the chunk is first drawn and
+    can be dropped again by its StaticLayer.
+    '''
+
+    def __init__(self, static_layer: 'StaticLayer', rect: pygame.Rect, groups: List[pygame.sprite.Group]) -> None:
+        super().__init__(groups)
+        self.static_layer = static_layer
+        self.rect = rect
+        # (surface, position relative to the chunk) in draw order
+        self.tiles = []
+        self.surface = None
+
+    def add_tile(self, surface: pygame.Surface, pos):
+        self.tiles.append(
+            (surface, (pos[0] - self.rect.left, pos[1] - self.rect.top)))
+        self.surface = None
+
+    @property
+    def image(self) -> pygame.Surface:
+        return self.static_layer.get_surface(self)
+
+
+class StaticLayer:
+    '''
+    Splits the level in chunks one screen of columns wide,
+    created when their first tile is added.
+    Only the most recently drawn chunks keep their rendered surface.
+    '''
+
+    def __init__(self, level_width, level_height, groups: List[pygame.sprite.Group], chunk_columns=SCREEN_WIDTH // TILE_SIZE, max_baked=4) -> None:
+        self.chunk_width = chunk_columns * TILE_SIZE
+        self.level_height = level_height
+        self.groups = groups
+        self.max_baked = max_baked
+        self.baked: OrderedDict = OrderedDict()
+        # chunk index -> chunk, index 0 starts at the left of the level
+        self.chunks: Dict[int, StaticChunk] = {}
+
+    def add(self, surface: pygame.Surface, pos):
+        index = pos[0] // self.chunk_width
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            rect = pygame.Rect(index * self.chunk_width, 0,
+                               self.chunk_width, self.level_height)
+            chunk = StaticChunk(self, rect, self.groups)
+            self.chunks[index] = chunk
+        self.baked.pop(chunk, None)
+        chunk.add_tile(surface, pos)
+
+    def remove_chunk(self, index: int):
+        # used when the level streams a chunk out
+        chunk = self.chunks.pop(index, None)
+        if chunk is not None:
+            self.baked.pop(chunk, None)
+            chunk.kill()
+
+    def bake(self, chunk: StaticChunk) -> pygame.Surface:
+        surface = pygame.Surface(chunk.rect.size, flags=pygame.SRCALPHA)
+        surface.blits(chunk.tiles, doreturn=False)
+        return surface
+
+    def get_surface(self, chunk: StaticChunk) -> pygame.Surface:
+        if chunk.surface is None:
+            chunk.surface = self.bake(chunk)
+        self.baked[chunk] = None
+        self.baked.move_to_end(chunk)
+        # drop chunks that have not been drawn for the longest time
+        while len(self.baked) > self.max_baked:
+            old_chunk, _ = self.baked.popitem(last=False)
+            old_chunk.surface = None
+        return chunk.surface
+
+
 if __name__ == '__main__':
     from main import main
     main()
@@ -0,0 +1,23 @@
+import subprocess
+from typing import List
+
+# helpers shared by the command line tools: benchmark.py and batch.py
+
+
+def git_commit() -> str:
+    # commit the results were measured on, empty outside a git checkout
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def parse_numbers(text: str) -> List[int]:
+    # comma separated numbers of an argument, like '100,1000,5000'
+    return [int(value) for value in text.split(',') if value]
+
+
+if __name__ == '__main__':
+    from main import main
+    main()
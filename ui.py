@@ -1,5 +1,67 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 import pygame
-from support import resource_path
+from support import import_image, resource_path
+
+# fonts stay loaded for the whole process
+fonts: Dict[Tuple[Optional[str], int], pygame.font.Font] = {}
+
+
+def get_font(path: Optional[str], size: int) -> pygame.font.Font:
+    # path None is pygame's default font
+    key = (path, size)
+    if key not in fonts:
+        fonts[key] = pygame.font.Font(
+            resource_path(path) if path else None, size)
+    return fonts[key]
+
+
+class TextCache:
+    '''
+    Rendered strings keyed by font, text, antialias and colour.
+    The least recently used strings are dropped when max_entries is reached.
+    '''
+
+    def __init__(self, max_entries: int = 128) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, antialias: bool, color) -> pygame.Surface:
+        key = (font, text, antialias, str(color))
+        surface = self.entries.get(key)
+        if surface is None:
+            surface = font.render(text, antialias, color)
+            self.entries[key] = surface
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surface
+
+
+text_cache = TextCache()
+
+
+class DigitAtlas:
+    '''
+    The ten digits of a font rendered once, numbers are put together from them.
+    Only for fonts without kerning between digits, like the HUD pixel font.
+    '''
+
+    def __init__(self, font: pygame.font.Font, antialias: bool, color) -> None:
+        self.glyphs = [text_cache.render(font, str(digit), antialias, color)
+                       for digit in range(10)]
+        self.height = font.get_height()
+
+    def render(self, number: int) -> pygame.Surface:
+        glyphs = [self.glyphs[int(digit)] for digit in str(number)]
+        surface = pygame.Surface(
+            (sum(glyph.get_width() for glyph in glyphs), self.height), flags=pygame.SRCALPHA)
+        x = 0
+        for glyph in glyphs:
+            surface.blit(glyph, (x, 0))
+            x += glyph.get_width()
+        return surface
 
 
 class UI:
@@ -8,35 +70,54 @@ class UI:
         self.display_surface = surface
 
         # health
-        self.health_bar = pygame.image.load(resource_path(
-            'assets/graphics/ui/health_bar.png')).convert_alpha()
+        self.health_bar = import_image('assets/graphics/ui/health_bar.png')
+        self.health_bar_pos = (20, 10)
         self.health_bar_topleft = (54, 39)
         self.bar_max_width = 152
         self.bar_height = 4
+        # bar with the indicator drawn in, rebuilt when health changes
+        self.health = None
+        self.health_surface: pygame.Surface = None
 
         # coins
-        self.coin = pygame.image.load(resource_path(
-            'assets/graphics/ui/coin.png')).convert_alpha()
+        self.coin = import_image('assets/graphics/ui/coin.png')
         self.coin_rect = self.coin.get_rect(topleft=(50, 61))
-        self.font = pygame.font.Font(resource_path(
-            'assets/graphics/ui/ARCADEPI.TTF'), 30)
+        self.font = get_font('assets/graphics/ui/ARCADEPI.TTF', 30)
+        self.digits = DigitAtlas(self.font, False, '#33323d')
+        # rendered coin amount, rebuilt when the amount changes
+        self.coin_amount = None
+        self.coin_amount_surface: pygame.Surface = None
+        self.coin_amount_rect: pygame.Rect = None
 
     def show_health(self, current, full):
-        # the health bar image is the background
-        self.display_surface.blit(self.health_bar, (20, 10))
-        # the actual health indicator is just a red rectangle on top of the health bar
-        current_health_ratio = current/full
-        current_bar_width = self.bar_max_width * current_health_ratio
-        health_bar_rect = pygame.Rect(
-            self.health_bar_topleft, (current_bar_width, self.bar_height))
-        pygame.draw.rect(self.display_surface, '#dc4949', health_bar_rect)
+        if self.health != (current, full):
+            self.health = (current, full)
+            # the health bar image is the background
+            self.health_surface = self.health_bar.copy()
+            # the actual health indicator is just a red rectangle on top of the health bar
+            current_health_ratio = current/full
+            current_bar_width = self.bar_max_width * current_health_ratio
+            # drawn on the copy, so relative to the bar image
+            left = self.health_bar_topleft[0] - self.health_bar_pos[0]
+            top = self.health_bar_topleft[1] - self.health_bar_pos[1]
+            health_bar_rect = pygame.Rect(
+                (left, top), (current_bar_width, self.bar_height))
+            pygame.draw.rect(self.health_surface, '#dc4949', health_bar_rect)
+        self.display_surface.blit(self.health_surface, self.health_bar_pos)
 
     def show_coins(self, amount):
         self.display_surface.blit(self.coin, self.coin_rect)
-        coin_amount_surface = self.font.render(str(amount), False, '#33323d')
-        coin_amount_rect = coin_amount_surface.get_rect(
-            midleft=(self.coin_rect.right + 4, self.coin_rect.centery))
-        self.display_surface.blit(coin_amount_surface, coin_amount_rect)
+        if amount != self.coin_amount:
+            self.coin_amount = amount
+            if amount < 0:
+                self.coin_amount_surface = text_cache.render(
+                    self.font, str(amount), False, '#33323d')
+            else:
+                self.coin_amount_surface = self.digits.render(amount)
+            self.coin_amount_rect = self.coin_amount_surface.get_rect(
+                midleft=(self.coin_rect.right + 4, self.coin_rect.centery))
+        self.display_surface.blit(
+            self.coin_amount_surface, self.coin_amount_rect)
 
 
 if __name__ == '__main__':